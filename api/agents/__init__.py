@@ -5,6 +5,8 @@ Data Science and Machine Learning Agents for specialized tasks
 from typing import Any, Callable, TypeVar, ParamSpec, Annotated, Dict, List, Optional, Type
 from pydantic import BaseModel, Field
 
+from utils.tool_registry import tool_registry, ToolSet
+
 P = ParamSpec('P')
 R = TypeVar('R')
 
@@ -14,29 +16,22 @@ class WebSearchTool:
     def __init__(self, name: str = "web_search", description: str = "Search the web for information"):
         self.name = name
         self.description = description
-        self.function = {
-            "name": name,
-            "description": description,
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "query": {
-                        "type": "string",
-                        "description": "The search query to find information"
-                    }
-                },
-                "required": ["query"]
-            }
-        }
+        tool_registry.register(self, name=name, description=description)
+        self.function = self.tool_spec.payload["function"]
     
     def __call__(self, query: str) -> str:
-        """Mock implementation that would be replaced with actual search functionality"""
+        """
+        Mock implementation that would be replaced with actual search functionality
+
+        Args:
+            query: The search query to find information
+        """
         return f"Search results for '{query}'"
 
 def function_tool(func: Callable[P, R]) -> Callable[P, R]:
-    """Decorator to convert a Python function into an agent tool"""
+    """Decorator to convert a Python function into an agent tool with a cached schema"""
     setattr(func, "is_tool", True)
-    return func
+    return tool_registry.register(func)
 
 class Agent:
     """Base class for creating agents with specialized capabilities"""
@@ -52,6 +47,11 @@ class Agent:
         self.tools.extend(tools)
         return self
 
+    @property
+    def tool_set(self) -> ToolSet:
+        """Provider payloads and callables for the agent's registered tools"""
+        return tool_registry.select(tool.tool_spec.name for tool in self.tools if hasattr(tool, "tool_spec"))
+
 # Don't import the specific agents here to avoid circular imports
 __all__ = [
     'WebSearchTool',
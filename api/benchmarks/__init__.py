@@ -0,0 +1 @@
+# Benchmarks for the API. Run from the api/ directory, e.g. `python -m benchmarks.concurrent_streams`
@@ -0,0 +1,70 @@
+"""
+Cost of re-reading an uploaded spreadsheet as text versus from its columnar copy.
+
+Generates a synthetic sales CSV, runs the same ingest conversion as /upload
+(utils.ingest.to_columnar) and compares, per read: the original CSV, the JSON
+records the agent tools receive today, and the downcast Parquet copy. Reports
+stored size, read time and in-memory size of the resulting DataFrame.
+
+    python -m benchmarks.columnar_ingest --rows 500000
+"""
+
+import argparse
+import io
+import time
+
+import numpy as np
+import pandas as pd
+
+from utils.ingest import to_columnar
+
+
+def make_csv(rows: int) -> bytes:
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({
+        "order_id": np.arange(rows),
+        "store": rng.choice([f"store-{i}" for i in range(40)], rows),
+        "category": rng.choice(["grocery", "toys", "garden", "electronics", "books"], rows),
+        "quantity": rng.integers(1, 20, rows),
+        "unit_price": rng.integers(100, 10000, rows) / 100,
+        "returned": rng.random(rows) < 0.05,
+    })
+    return df.to_csv(index=False).encode()
+
+
+def timed(read, repeat: int) -> tuple:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        df = read()
+        best = min(best, time.perf_counter() - start)
+    return best, df.memory_usage(deep=True).sum()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=500000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    csv = make_csv(args.rows)
+    records = pd.read_csv(io.BytesIO(csv)).to_json(orient="records").encode()
+
+    start = time.perf_counter()
+    columnar = to_columnar(io.BytesIO(csv), "sales.csv", "text/csv")
+    print(f"ingest conversion: {time.perf_counter() - start:.2f}s, "
+          f"{columnar.rows} rows x {columnar.columns} columns, dtypes {columnar.dtypes}")
+
+    readers = (
+        ("csv", csv, lambda: pd.read_csv(io.BytesIO(csv))),
+        ("json records", records, lambda: pd.read_json(io.BytesIO(records))),
+        ("parquet", columnar.data, lambda: pd.read_parquet(io.BytesIO(columnar.data))),
+    )
+    for name, data, read in readers:
+        seconds, memory = timed(read, args.repeat)
+        print(f"{name:>12}: stored {len(data) / 2 ** 20:6.1f} MB, read {seconds * 1000:7.1f}ms, "
+              f"in memory {memory / 2 ** 20:6.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Concurrency benchmark for the /api/chat streaming engine.
+
+Runs N chat streams in parallel on a single event loop against the local
+mock provider and reports wall time and the worst event-loop stall seen by
+a 10ms heartbeat task. `--mode blocking` reproduces the previous engine,
+which iterated litellm's synchronous `completion(stream=True)` inside an
+async generator.
+
+    python -m benchmarks.concurrent_streams --streams 20 --tokens 50 --delay 10
+"""
+
+import argparse
+import asyncio
+import time
+
+from litellm import completion
+
+from benchmarks.mock_provider import serve, mock_model_config
+import chat
+
+MODEL_ID = "mock"
+MESSAGES = [{"role": "user", "content": [{"type": "text", "text": "hello"}]}]
+
+
+async def blocking_stream(messages, modelId):
+    """The pre-async engine: a sync litellm stream iterated on the event loop"""
+    config = chat.model_configs[modelId]
+    response = completion(
+        messages=messages,
+        model=f"{config['provider']}/{config['model']}",
+        stream=True,
+        api_key=config['api_key'],
+        api_base=config['api_base'],
+    )
+    for chunk in response:
+        for choice in chunk.choices:
+            if choice.delta.content:
+                yield choice.delta.content
+
+
+async def consume(stream) -> int:
+    frames = 0
+    async for _ in stream:
+        frames += 1
+    return frames
+
+
+async def heartbeat(stop: asyncio.Event, interval: float = 0.01) -> float:
+    """Return the worst observed delay of a periodic timer, in seconds"""
+    worst = 0.0
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        worst = max(worst, time.perf_counter() - started - interval)
+    return worst
+
+
+async def run(mode: str, streams: int) -> dict:
+    stop = asyncio.Event()
+    monitor = asyncio.create_task(heartbeat(stop))
+    started = time.perf_counter()
+
+    if mode == "async":
+        tasks = [consume(chat.stream_text(MESSAGES, MODEL_ID)) for _ in range(streams)]
+    else:
+        tasks = [consume(blocking_stream(MESSAGES, MODEL_ID)) for _ in range(streams)]
+    frames = await asyncio.gather(*tasks)
+
+    elapsed = time.perf_counter() - started
+    stop.set()
+    worst_stall = await monitor
+    return {"elapsed": elapsed, "frames": sum(frames), "worst_stall": worst_stall}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--streams", type=int, default=20)
+    parser.add_argument("--tokens", type=int, default=50)
+    parser.add_argument("--delay", type=float, default=10, help="per-token delay in ms")
+    parser.add_argument("--mode", choices=["async", "blocking", "both"], default="both")
+    args = parser.parse_args()
+
+    api_base = serve(tokens=args.tokens, token_delay=args.delay / 1000)
+    chat.model_configs[MODEL_ID] = mock_model_config(api_base)
+
+    ideal = args.tokens * args.delay / 1000
+    print(f"{args.streams} streams x {args.tokens} tokens @ {args.delay}ms (single stream ~{ideal:.2f}s)")
+    # litellm initializes lazily on first use; keep that out of the measurement
+    asyncio.run(consume(chat.stream_text(MESSAGES, MODEL_ID)))
+
+    modes = ["blocking", "async"] if args.mode == "both" else [args.mode]
+    for mode in modes:
+        result = asyncio.run(run(mode, args.streams))
+        print(f"{mode:>9}: wall {result['elapsed']:.2f}s, "
+              f"worst loop stall {result['worst_stall'] * 1000:.0f}ms, "
+              f"{result['frames']} frames")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Write and CPU cost of streaming a chat answer with and without frame coalescing.
+
+Serves a synthetic answer through uvicorn and the same GZip middleware as the
+API, encoded as data-stream frames, and reads it back over a real socket.
+Reports socket writes per response (one `send` syscall each; counted at the
+asyncio transport) and process CPU time per response for a range of windows.
+
+    python -m benchmarks.frame_coalescing --responses 10 --tokens 2000 --delay 0.5
+"""
+
+import argparse
+import asyncio
+import threading
+import time
+from asyncio import selector_events
+
+import httpx
+import uvicorn
+from fastapi import FastAPI
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import StreamingResponse
+
+from benchmarks.mock_provider import _free_port
+from utils.stream import TextDelta, Finish, encode_event, coalesce
+
+app = FastAPI()
+app.add_middleware(GZipMiddleware)
+app.state.tokens = 2000
+app.state.delay = 0.0005
+app.state.window = 0.0
+
+server_writes = 0
+_write = selector_events._SelectorSocketTransport.write
+
+
+def _counting_write(self, data):
+    global server_writes
+    if threading.current_thread().name == "server":
+        server_writes += 1
+    return _write(self, data)
+
+
+selector_events._SelectorSocketTransport.write = _counting_write
+
+
+async def answer():
+    for i in range(app.state.tokens):
+        await asyncio.sleep(app.state.delay)
+        yield TextDelta(f" tok{i}")
+    yield Finish("stop", 10, app.state.tokens)
+
+
+@app.get("/stream")
+async def stream():
+    async def frames():
+        async for event in coalesce(answer(), window=app.state.window):
+            frame = encode_event(event)
+            if frame:
+                yield frame
+    return StreamingResponse(frames())
+
+
+def serve() -> str:
+    port = _free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, name="server", daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    return f"http://127.0.0.1:{port}/stream"
+
+
+async def measure(url: str, responses: int) -> tuple:
+    global server_writes
+    async with httpx.AsyncClient(headers={"accept-encoding": "gzip"}) as client:
+        server_writes = 0
+        cpu = time.process_time()
+        wall = time.perf_counter()
+        for _ in range(responses):
+            async with client.stream("GET", url) as response:
+                async for _ in response.aiter_raw():
+                    pass
+        cpu = time.process_time() - cpu
+        wall = time.perf_counter() - wall
+    return server_writes / responses, cpu / responses, wall / responses
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--responses", type=int, default=20)
+    parser.add_argument("--tokens", type=int, default=2000)
+    parser.add_argument("--delay", type=float, default=0.5, help="milliseconds between provider deltas")
+    parser.add_argument("--windows", default="0,5,20,50", help="coalescing windows to compare, in ms")
+    args = parser.parse_args()
+
+    app.state.tokens = args.tokens
+    app.state.delay = args.delay / 1000
+    url = serve()
+    await measure(url, 1)
+
+    for window in (float(w) for w in args.windows.split(",")):
+        app.state.window = window / 1000
+        writes, cpu, wall = await measure(url, args.responses)
+        print(f"window {window:4.0f}ms: {writes:7.1f} writes/response, "
+              f"cpu {cpu * 1000:6.1f}ms/response, wall {wall * 1000:6.1f}ms/response")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
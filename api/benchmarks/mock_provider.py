@@ -0,0 +1,162 @@
+"""
+Local OpenAI-compatible provider used by the benchmarks.
+
+Streams `/v1/chat/completions` as server-sent events with a fixed delay
+between tokens, so benchmarks can exercise the real litellm code path
+without network access or API keys.
+"""
+
+import asyncio
+import json
+import datetime
+import os
+import socket
+import tempfile
+import threading
+import time
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+app = FastAPI()
+app.state.token_delay = 0.01
+app.state.tokens = 50
+app.state.peers = set()
+
+
+def _chunk(delta: dict, finish_reason=None) -> str:
+    payload = {
+        "id": "chatcmpl-mock",
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": "mock",
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+    }
+    return f"data: {json.dumps(payload)}\n\n"
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    app.state.peers.add((request.client.host, request.client.port))
+    body = await request.json()
+    tokens = app.state.tokens
+    delay = app.state.token_delay
+
+    async def events():
+        for i in range(tokens):
+            await asyncio.sleep(delay)
+            yield _chunk({"role": "assistant", "content": f"tok{i} "})
+        yield _chunk({}, finish_reason="stop")
+        if body.get("stream_options", {}).get("include_usage"):
+            usage = {"prompt_tokens": 10, "completion_tokens": tokens, "total_tokens": tokens + 10}
+            yield "data: " + json.dumps({
+                "id": "chatcmpl-mock",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": "mock",
+                "choices": [],
+                "usage": usage,
+            }) + "\n\n"
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+def connections() -> int:
+    """Number of distinct client connections that have sent a completion request"""
+    return len(app.state.peers)
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _self_signed_cert() -> tuple:
+    """Write a throwaway certificate for 127.0.0.1 and return (certfile, keyfile)"""
+    from cryptography import x509
+    from cryptography.hazmat.primitives import hashes, serialization
+    from cryptography.hazmat.primitives.asymmetric import ec
+    from cryptography.x509.oid import NameOID
+
+    key = ec.generate_private_key(ec.SECP256R1())
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "127.0.0.1")])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    cert = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now)
+        .not_valid_after(now + datetime.timedelta(days=1))
+        .sign(key, hashes.SHA256())
+    )
+
+    directory = tempfile.mkdtemp(prefix="mock-provider-")
+    certfile = os.path.join(directory, "cert.pem")
+    keyfile = os.path.join(directory, "key.pem")
+    with open(certfile, "wb") as f:
+        f.write(cert.public_bytes(serialization.Encoding.PEM))
+    with open(keyfile, "wb") as f:
+        f.write(key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                                  serialization.NoEncryption()))
+    return certfile, keyfile
+
+
+def _serve_tls(port: int) -> None:
+    """Serve over TLS with hypercorn, which negotiates HTTP/2 like the real providers do"""
+    from hypercorn.asyncio import serve as hypercorn_serve
+    from hypercorn.config import Config
+
+    certfile, keyfile = _self_signed_cert()
+    config = Config()
+    config.bind = [f"127.0.0.1:{port}"]
+    config.certfile = certfile
+    config.keyfile = keyfile
+    config.alpn_protocols = ["h2", "http/1.1"]
+    config.loglevel = "WARNING"
+    # A shutdown trigger stops hypercorn from installing signal handlers, which only work on the main thread
+    server = hypercorn_serve(app, config, shutdown_trigger=asyncio.Event().wait)
+    thread = threading.Thread(target=asyncio.run, args=(server,), daemon=True)
+    thread.start()
+
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.1).close()
+            return
+        except OSError:
+            time.sleep(0.01)
+    raise RuntimeError("Mock provider did not start")
+
+
+def serve(tokens: int = 50, token_delay: float = 0.01, tls: bool = False) -> str:
+    """Start the mock provider in a background thread and return its base URL"""
+    app.state.tokens = tokens
+    app.state.token_delay = token_delay
+
+    port = _free_port()
+    if tls:
+        _serve_tls(port)
+        return f"https://127.0.0.1:{port}/v1"
+
+    config = uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning")
+    server = uvicorn.Server(config)
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    return f"http://127.0.0.1:{port}/v1"
+
+
+def mock_model_config(api_base: str) -> dict:
+    """Model config entry pointing litellm at the mock provider"""
+    return {
+        "provider": "openai",
+        "model": "mock",
+        "api_key": "mock-key",
+        "api_base": api_base,
+    }
@@ -0,0 +1,86 @@
+"""
+Connection reuse benchmark for provider HTTP clients.
+
+Sends sequential chat completions through litellm to the local mock provider
+over TLS and reports new TCP connections and time to first token. `fresh`
+builds a new HTTP client per request, paying the TCP and TLS handshakes each
+time; `pooled` uses the shared, pre-warmed pool from utils.providers.
+
+    python -m benchmarks.provider_pool --requests 50 --tokens 5
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+from litellm import acompletion
+from openai import AsyncOpenAI
+
+from benchmarks import mock_provider
+from benchmarks.mock_provider import serve, mock_model_config
+from utils.providers import ProviderClients
+
+MESSAGES = [{"role": "user", "content": "hello"}]
+
+
+async def first_token(config: dict, client=None) -> float:
+    started = time.perf_counter()
+    ttft = None
+    response = await acompletion(
+        messages=MESSAGES,
+        model=f"{config['provider']}/{config['model']}",
+        stream=True,
+        api_key=config['api_key'],
+        api_base=config['api_base'],
+        client=client,
+    )
+    async for chunk in response:
+        if ttft is None and chunk.choices and chunk.choices[0].delta.content:
+            ttft = time.perf_counter() - started
+    return ttft
+
+
+async def run_fresh(config: dict, requests: int) -> list:
+    timings = []
+    for _ in range(requests):
+        http = httpx.AsyncClient(verify=False)
+        client = AsyncOpenAI(api_key=config['api_key'], base_url=config['api_base'], http_client=http)
+        timings.append(await first_token(config, client))
+        await http.aclose()
+    return timings
+
+
+async def run_pooled(config: dict, requests: int) -> list:
+    pool = ProviderClients(verify=False)
+    await pool.start({"mock": config})
+    try:
+        return [await first_token(config) for _ in range(requests)]
+    finally:
+        await pool.close()
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--tokens", type=int, default=5)
+    parser.add_argument("--delay", type=float, default=1, help="milliseconds between tokens")
+    args = parser.parse_args()
+
+    config = mock_model_config(serve(args.tokens, args.delay / 1000, tls=True))
+
+    # litellm initialises lazily on its first call; keep that out of the measurements
+    await run_fresh(config, 1)
+
+    for name, run in (("fresh", run_fresh), ("pooled", run_pooled)):
+        before = mock_provider.connections()
+        timings = sorted(await run(config, args.requests))
+        connections = mock_provider.connections() - before
+        print(f"{name:>6}: {connections:3d} connections, "
+              f"ttft p50 {statistics.median(timings) * 1000:6.2f}ms, "
+              f"p95 {timings[int(len(timings) * 0.95)] * 1000:6.2f}ms")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,91 @@
+"""
+Per-token CPU cost of turning provider deltas into data-stream frames.
+
+`before` reproduces the previous pipeline: stream_text formatted each delta
+as a `0:<json>` string, and response_generator parsed it back with a double
+json.loads and grew `full_content` with `+=`. `after` is the typed event
+path: TextDelta events are collected into a list and encoded once with
+encode_event.
+
+    python -m benchmarks.stream_encoding --tokens 4096
+"""
+
+import argparse
+import json
+import time
+
+from utils.stream import TextDelta, Finish, encode_event
+
+
+def make_deltas(tokens: int):
+    # Mix of word, numeric and punctuation tokens, like a real answer
+    pool = [" the", " value", " 42", ",", " column", "\n", " is", " 3.14", " \"mean\"", "."]
+    return [pool[i % len(pool)] for i in range(tokens)]
+
+
+def before(deltas):
+    def stream_text():
+        for delta in deltas:
+            yield '0:{text}\n'.format(text=json.dumps(delta))
+        yield 'd:{"finishReason":"stop","usage":{"promptTokens":10,"completionTokens":%d}}\n' % len(deltas)
+
+    full_content = ""
+    frames = []
+    for chunk in stream_text():
+        frames.append(chunk)
+        if chunk.startswith('0:'):
+            try:
+                content_json = chunk[2:].strip()
+                if content_json:
+                    content = json.loads(json.loads(content_json))
+                    if content:
+                        full_content += content
+            except Exception:
+                pass  # The old code printed here; left out so terminal I/O is not measured
+    return full_content, frames
+
+
+def after(deltas):
+    def stream_text():
+        for delta in deltas:
+            yield TextDelta(delta)
+        yield Finish("stop", 10, len(deltas))
+
+    content_parts = []
+    frames = []
+    for event in stream_text():
+        if type(event) is TextDelta:
+            content_parts.append(event.text)
+        frame = encode_event(event, 'data')
+        if frame:
+            frames.append(frame)
+    return "".join(content_parts), frames
+
+
+def measure(func, deltas, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.process_time()
+        func(deltas)
+        best = min(best, time.process_time() - started)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tokens", type=int, default=4096)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    deltas = make_deltas(args.tokens)
+    assert before(deltas)[1] == after(deltas)[1], "wire frames differ"
+    print(f"{args.tokens}-token response, best of {args.repeat}")
+    for name, func in (("before", before), ("after", after)):
+        elapsed = measure(func, deltas, args.repeat)
+        content, _ = func(deltas)
+        print(f"{name:>7}: {elapsed * 1000:.2f}ms total, {elapsed / args.tokens * 1e9:.0f}ns/token, "
+              f"captured {len(content)}/{len(''.join(deltas))} chars")
+
+
+if __name__ == "__main__":
+    main()
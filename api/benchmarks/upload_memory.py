@@ -0,0 +1,146 @@
+"""
+Peak memory of storage uploads, buffered versus streamed.
+
+Starts a fake Supabase Storage server in a subprocess (standard object uploads
+plus the TUS resumable protocol, discarding the bytes) and uploads a spooled
+file of --size MB with tracemalloc running. `buffered` is the previous
+`await file.read()` path; `streamed` is utils.storage_upload. With
+--fail-once the server rejects the second chunk once, so the streamed path has
+to resume from the offset the server confirms.
+
+    python -m benchmarks.upload_memory --size 50 --fail-once
+"""
+
+import argparse
+import asyncio
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import uuid
+
+import httpx
+from fastapi import FastAPI, Request, Response, UploadFile
+from starlette.datastructures import Headers
+
+from benchmarks.mock_provider import _free_port
+from utils.storage_upload import StorageUploader, CHUNK_SIZE
+
+storage = FastAPI()
+storage.state.sessions = {}
+storage.state.fail_once = False
+storage.state.stored = {}
+
+
+async def _drain(request: Request) -> int:
+    size = 0
+    async for chunk in request.stream():
+        size += len(chunk)
+    return size
+
+
+@storage.post("/storage/v1/object/{bucket}/{path:path}")
+async def upload_object(bucket: str, path: str, request: Request):
+    storage.state.stored[f"{bucket}/{path}"] = await _drain(request)
+    return {"Key": f"{bucket}/{path}"}
+
+
+@storage.post("/storage/v1/upload/resumable")
+async def create_session(request: Request):
+    session_id = uuid.uuid4().hex
+    storage.state.sessions[session_id] = {"length": int(request.headers["upload-length"]), "offset": 0}
+    return Response(status_code=201, headers={"Location": f"/storage/v1/upload/resumable/{session_id}"})
+
+
+@storage.patch("/storage/v1/upload/resumable/{session_id}")
+async def append_chunk(session_id: str, request: Request):
+    session = storage.state.sessions[session_id]
+    if int(request.headers["upload-offset"]) != session["offset"]:
+        return Response(status_code=409)
+    if storage.state.fail_once and session["offset"] == CHUNK_SIZE:
+        storage.state.fail_once = False
+        await _drain(request)
+        return Response(status_code=500)
+    session["offset"] += await _drain(request)
+    return Response(status_code=204, headers={"Upload-Offset": str(session["offset"])})
+
+
+@storage.head("/storage/v1/upload/resumable/{session_id}")
+async def session_offset(session_id: str):
+    session = storage.state.sessions[session_id]
+    return Response(status_code=200, headers={"Upload-Offset": str(session["offset"]),
+                                              "Upload-Length": str(session["length"])})
+
+
+def start_storage(fail_once: bool) -> subprocess.Popen:
+    port = _free_port()
+    args = [sys.executable, "-m", "benchmarks.upload_memory", "--serve", str(port)]
+    if fail_once:
+        args.append("--fail-once")
+    process = subprocess.Popen(args)
+    deadline = time.monotonic() + 20
+    while time.monotonic() < deadline:
+        try:
+            httpx.head(f"http://127.0.0.1:{port}/")
+            return process, f"http://127.0.0.1:{port}"
+        except httpx.HTTPError:
+            time.sleep(0.05)
+    process.kill()
+    raise RuntimeError("Fake storage server did not start")
+
+
+def make_upload(size_mb: int) -> UploadFile:
+    spooled = tempfile.SpooledTemporaryFile(max_size=1024 * 1024)
+    block = bytes(range(256)) * 4096
+    for _ in range(size_mb):
+        spooled.write(block)
+    spooled.seek(0)
+    return UploadFile(file=spooled, size=size_mb * len(block), filename="data.csv",
+                      headers=Headers({"content-type": "text/csv"}))
+
+
+async def buffered(url: str, file: UploadFile) -> int:
+    """The previous implementation: read the whole file, then send it"""
+    contents = await file.read()
+    async with httpx.AsyncClient(timeout=60) as client:
+        await client.post(f"{url}/storage/v1/object/data-files/user/chat/buffered.csv", content=contents)
+    return len(contents)
+
+
+async def streamed(url: str, file: UploadFile) -> int:
+    uploader = StorageUploader(url=url, key="anon")
+    try:
+        return await uploader.upload("data-files", "user/chat/streamed.csv", file, "text/csv")
+    finally:
+        await uploader.close()
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=50, help="file size in MB")
+    parser.add_argument("--fail-once", action="store_true")
+    parser.add_argument("--serve", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        import uvicorn
+        storage.state.fail_once = args.fail_once
+        await uvicorn.Server(uvicorn.Config(storage, host="127.0.0.1", port=args.serve, log_level="warning")).serve()
+        return
+
+    process, url = start_storage(args.fail_once)
+    try:
+        for name, run in (("buffered", buffered), ("streamed", streamed)):
+            file = make_upload(args.size)
+            tracemalloc.start()
+            sent = await run(url, file)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            print(f"{name:>8}: sent {sent / 2 ** 20:5.1f} MB, peak traced memory {peak / 2 ** 20:6.1f} MB")
+    finally:
+        process.terminate()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,39 +1,70 @@
-from litellm import completion
-from fastapi import APIRouter, HTTPException, Request, Body, Query, Depends, status
+from litellm import acompletion
+from fastapi import APIRouter, HTTPException, Request, Body, Query, Depends, status, WebSocket, WebSocketDisconnect
 from fastapi.responses import StreamingResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from dotenv import load_dotenv
 import uuid
 import json
-from typing import List, Optional
-from pydantic import BaseModel
+from typing import AsyncIterator, List, Optional
+from pydantic import BaseModel, ValidationError
 from utils.prompt import ClientMessage
-from utils.tools import get_current_weather
+from utils.tools import CHAT_TOOLS
+from utils.tool_registry import tool_registry
+from utils.tool_executor import tool_executor
+from utils.response_cache import response_cache
+from utils.conversation import ConversationStore, message_fields
+from utils.context import context_window
+from utils.hedging import hedger, HEDGE_DEADLINE, HedgeUnavailable
+from utils.admission import admission, AdmittedStream
+from utils.model_router import model_router, AUTO_MODEL_ID
+from utils.telemetry import StreamTelemetry
+from utils.stream_buffer import stream_buffer
+from utils.redis import redis_client
 from settings.config import initialize_model_configs
 from utils.prompt import convert_to_openai_messages
+from utils.attachments import attachment_fetcher, IMAGE_MAX_SIDE
+from utils.stream import TextDelta, ToolCall, ToolResult, Finish, encode_event, coalesce
 from db.queries import DatabaseQueries
 from db.mutations import DatabaseMutations
+from db.write_queue import message_queue
 from client import supabase
 from utils.auth import get_current_user
 from openai.types.chat.chat_completion_message_param import ChatCompletionMessageParam
-from openai import OpenAI
-import os 
+import asyncio
+import os
 
 load_dotenv()
 router = APIRouter()
 model_configs = initialize_model_configs()
 db = DatabaseQueries(supabase)
 mutations = DatabaseMutations(supabase)
+conversations = ConversationStore(db, redis_client, message_queue)
 bearer_scheme = HTTPBearer()
 
-client = OpenAI(
-    api_key=os.environ.get("OPENAI_API_KEY"),
-)
-
 class ChatRequest(BaseModel):
-    messages: List[ClientMessage]
+    messages: List[ClientMessage] = []
+    # Send only the new message with a chatId to have the server rebuild the history
+    message: Optional[ClientMessage] = None
     modelId: str
     chatId: Optional[str] = None
+    # Only used with modelId "auto", e.g. ["vision"]; "tools" is always required
+    capabilities: List[str] = []
+
+class BatchItem(BaseModel):
+    id: Optional[str] = None
+    messages: List[ClientMessage]
+
+class BatchRequest(BaseModel):
+    modelId: str
+    items: List[BatchItem]
+    concurrency: Optional[int] = None
+
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "500"))
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "4"))
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "16"))
+BATCH_ADMISSION_RETRIES = int(os.getenv("BATCH_ADMISSION_RETRIES", "3"))
+WS_MAX_STREAMS = int(os.getenv("WS_MAX_STREAMS", "8"))
+WS_AUTH_TIMEOUT = float(os.getenv("WS_AUTH_TIMEOUT", "10"))
 
 def generate_title(messages: List[ClientMessage]) -> str:
     try:
@@ -44,7 +75,52 @@ def generate_title(messages: List[ClientMessage]) -> str:
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Error generating title: {str(e)}")
 
-def stream_text(messages: List[dict], protocol: str = 'data', modelId: str = None):    
+async def open_completion(config: dict, messages: List[dict], tools: List[dict]):
+    """Start a streaming completion against the provider in a model config"""
+    return await acompletion(
+        messages=messages,
+        model=f"{config['provider']}/{config['model']}",
+        stream=True,
+        stream_options={"include_usage": True},
+        api_key=config['api_key'],
+        api_base=config.get('api_base'),
+        tools=tools,
+    )
+
+def completion_candidates(modelId: str, config: dict, messages: List[dict], tools: List[dict],
+                          telemetry: StreamTelemetry = None):
+    """
+    The primary model plus its hedge fallback, if one is configured.
+    The caller holds the primary's admission slot; the fallback takes its own when the hedge
+    starts, or is skipped if its model or tier has no free slot.
+    """
+    def opener(model_id: str, model_config: dict, admit: bool = False):
+        async def open_stream():
+            slot = None
+            if admit:
+                slot = admission.try_acquire(model_id, model_config)
+                if slot is None:
+                    raise HedgeUnavailable(f"no free admission slot for {model_id}")
+            try:
+                response = await open_completion(model_config, messages, tools)
+            except BaseException:
+                if slot:
+                    slot.release()
+                raise
+            if telemetry:
+                telemetry.connected(model_id)
+            return AdmittedStream(response, slot) if slot else response
+        return open_stream
+
+    candidates = [(modelId, opener(modelId, config))]
+    hedge = config.get("hedge")
+    if hedge and model_configs.get(hedge["fallback"]):
+        fallback = hedge["fallback"]
+        candidates.append((fallback, opener(fallback, model_configs[fallback], admit=True)))
+    return candidates, (hedge or {}).get("deadline", HEDGE_DEADLINE)
+
+async def stream_text(messages: List[dict], modelId: str = None, telemetry: StreamTelemetry = None):
+    """Stream a completion as typed events; encoding to the wire format happens at the edge"""
     # Check if modelId was passed separately
     if not modelId:
         raise HTTPException(status_code=400, detail="Missing modelId in request")
@@ -52,184 +128,469 @@ def stream_text(messages: List[dict], protocol: str = 'data', modelId: str = Non
     config = model_configs.get(modelId)
     if not config:
         raise HTTPException(status_code=400, detail=f"Invalid model ID: {modelId}")
+
+    # Keep long histories within the model's prompt budget
+    messages = context_window.fit(messages, config)
     
-    # Define available tools - this will work for OpenAI and other providers
-    available_tools = {"get_current_weather": get_current_weather}
+    # Schemas are generated once when tools register; the tool set is cached by name
+    tool_set = tool_registry.select(CHAT_TOOLS)
+    tools = tool_set.payloads
+    response = None
     
     try:
-        # Define tools properly with function definitions
-        tools = [
-            {
-                "type": "function",
-                "function": {
-                    "name": "get_current_weather",
-                    "description": "Get the current weather in a given location",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "location": {
-                                "type": "string",
-                                "description": "The city and state, e.g. San Francisco, CA"
-                            },
-                            "unit": {
-                                "type": "string",
-                                "enum": ["celsius", "fahrenheit"],
-                                "description": "The unit of temperature to use"
-                            }
-                        },
-                        "required": ["location"]
-                    }
-                }
-            }
-        ]
+        # Replay an identical earlier answer when the model opts into response caching
+        cache_key = None
+        if config.get("response_cache"):
+            cache_key = response_cache.make_key(modelId, messages, tool_set.digest)
+            cached_events = response_cache.get(cache_key)
+            if cached_events:
+                if telemetry:
+                    telemetry.cached()
+                for event in cached_events:
+                    yield event
+                return
         
-        response = completion(
-            messages=messages,
-            model=f"{config['provider']}/{config['model']}",
-            stream=True,
-            api_key=config['api_key'],
-            tools=tools,
-        )
-
-        if (protocol == 'text'):
-            for chunk in response:
-                for choice in chunk.choices:
-                    if choice.finish_reason == 'stop':
-                        break
-                    else:
-                        yield "{text}".format(text=choice.delta.content)
-
-        elif (protocol == 'data'):
-            draft_tool_calls = []
-            draft_tool_calls_index = -1
-
-            for chunk in response:
-                for choice in chunk.choices:
-                    if choice.finish_reason == "stop":
-                        continue
+        # If the primary model is slow to produce its first token, race a fallback model
+        candidates, deadline = completion_candidates(modelId, config, messages, tools, telemetry)
+        winner, response = await hedger.open(candidates, deadline)
+        if telemetry:
+            telemetry.served(winner)
+        if winner != modelId:
+            cache_key = None  # Don't cache another model's answer under this model
+
+        draft_tool_calls = []
+        draft_tool_calls_index = -1
+        content_parts = []
+
+        async for chunk in response:
+            for choice in chunk.choices:
+                if choice.finish_reason == "stop":
+                    continue
+
+                elif choice.finish_reason == "tool_calls":
+                    for tool_call in draft_tool_calls:
+                        yield ToolCall(tool_call["id"], tool_call["name"], tool_call["arguments"])
+
+                    # Run the turn's tools concurrently and emit each result as soon as it is ready
+                    async for tool_call, tool_result in tool_executor.run(draft_tool_calls, tool_set.functions):
+                        yield ToolResult(tool_call["id"], tool_call["name"], tool_call["arguments"], tool_result)
+
+                elif choice.delta.tool_calls:
+                    for tool_call in choice.delta.tool_calls:
+                        id = tool_call.id
+                        name = tool_call.function.name
+                        arguments = tool_call.function.arguments
 
-                    elif choice.finish_reason == "tool_calls":
-                        for tool_call in draft_tool_calls:
-                            yield '9:{{"toolCallId":"{id}","toolName":"{name}","args":{args}}}\n'.format(
-                                id=tool_call["id"],
-                                name=tool_call["name"],
-                                args=tool_call["arguments"])
-
-                        for tool_call in draft_tool_calls:
-                            tool_result = available_tools[tool_call["name"]](
-                                **json.loads(tool_call["arguments"]))
-
-                            yield 'a:{{"toolCallId":"{id}","toolName":"{name}","args":{args},"result":{result}}}\n'.format(
-                                id=tool_call["id"],
-                                name=tool_call["name"],
-                                args=tool_call["arguments"],
-                                result=json.dumps(tool_result))
-
-                    elif choice.delta.tool_calls:
-                        for tool_call in choice.delta.tool_calls:
-                            id = tool_call.id
-                            name = tool_call.function.name
-                            arguments = tool_call.function.arguments
-
-                            if (id is not None):
-                                draft_tool_calls_index += 1
-                                draft_tool_calls.append(
-                                    {"id": id, "name": name, "arguments": ""})
-
-                            else:
-                                draft_tool_calls[draft_tool_calls_index]["arguments"] += arguments
-
-                    else:
-                        yield '0:{text}\n'.format(text=json.dumps(choice.delta.content))
-
-                if chunk.choices == []:
-                    usage = chunk.usage
-                    prompt_tokens = usage.prompt_tokens
-                    completion_tokens = usage.completion_tokens
-
-                    yield 'd:{{"finishReason":"{reason}","usage":{{"promptTokens":{prompt},"completionTokens":{completion}}}}}\n'.format(
-                        reason="tool-calls" if len(
-                            draft_tool_calls) > 0 else "stop",
-                        prompt=prompt_tokens,
-                        completion=completion_tokens
-                    )
+                        if (id is not None):
+                            draft_tool_calls_index += 1
+                            draft_tool_calls.append(
+                                {"id": id, "name": name, "arguments": ""})
+
+                        else:
+                            draft_tool_calls[draft_tool_calls_index]["arguments"] += arguments
+
+                elif choice.delta.content:
+                    if cache_key:
+                        content_parts.append(choice.delta.content)
+                    yield TextDelta(choice.delta.content)
+
+            # litellm attaches usage to the trailing chunk rather than sending an empty choices list
+            usage = getattr(chunk, "usage", None)
+            if usage:
+                if cache_key and not draft_tool_calls:
+                    response_cache.set(cache_key, "".join(content_parts), usage.prompt_tokens, usage.completion_tokens)
+
+                yield Finish(
+                    reason="tool-calls" if len(draft_tool_calls) > 0 else "stop",
+                    prompt_tokens=usage.prompt_tokens,
+                    completion_tokens=usage.completion_tokens
+                )
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Chat does not work. {str(e)}")
+    finally:
+        # Closing the provider stream frees its connection when the client goes away early
+        if response is not None:
+            await response.aclose()
     
+def required_capabilities(messages: List[ClientMessage], declared: List[str]) -> set:
+    """Capabilities a model needs to serve a conversation"""
+    required = set(declared)
+    if CHAT_TOOLS:
+        required.add("tools")
+    if any(attachment.contentType.startswith("image")
+           for message in messages for attachment in (message.experimental_attachments or [])):
+        required.add("vision")
+    return required
+
+def message_row(chatId: str, message: ClientMessage) -> dict:
+    """A `messages` row; attachments and tool invocations are kept so delta requests can rebuild them"""
+    fields = message_fields(message)
+    row = {"role": message.role, "content": message.content, "chat_id": chatId}
+    if "experimental_attachments" in fields:
+        row["experimental_attachments"] = fields["experimental_attachments"]
+    if "toolInvocations" in fields:
+        row["tool_invocations"] = fields["toolInvocations"]
+    return row
+
+def tool_invocation(event: ToolCall) -> dict:
+    try:
+        args = json.loads(event.args or "{}")
+    except ValueError:
+        args = event.args
+    return {"toolCallId": event.id, "toolName": event.name, "args": args}
+
+async def owned_chat(chatId: str, user: dict) -> bool:
+    """
+    Whether `chatId` exists; raises 404 when it belongs to someone else, so a chat id alone
+    never gives access to another user's history
+    """
+    chat = await asyncio.to_thread(db.get_chat, chatId)
+    if chat is None:
+        return False
+    if chat["user_id"] != user["id"]:
+        raise HTTPException(status_code=404, detail="Chat not found")
+    return True
+
+async def chat_turn(request_data: ChatRequest, user: dict, protocol: str = 'data') -> AsyncIterator[str]:
+    """
+    Validate a chat request, wait for a completion slot and return the turn's encoded frames.
+    Errors before the first frame raise HTTPException; the turn is saved once it completes,
+    if the chat exists and belongs to `user`.
+    """
+    messages = request_data.messages
+    modelId = request_data.modelId
+    chatId = request_data.chatId
+    persist = bool(chatId) and await owned_chat(chatId, user)
+
+    if request_data.message:
+        # Delta request: rebuild the history server-side and append the new message
+        if not chatId:
+            raise HTTPException(status_code=400, detail="chatId is required when sending a single message")
+        if not persist:
+            raise HTTPException(status_code=404, detail="Chat not found")
+        new_messages = [request_data.message]
+        messages = await conversations.load(chatId) + new_messages
+    else:
+        if not messages:
+            raise HTTPException(status_code=400, detail="No messages provided")
+        # Earlier turns were persisted when they completed; only the latest user message is new
+        new_messages = [messages[-1]] if messages[-1].role == "user" else []
+
+    if modelId == AUTO_MODEL_ID:
+        modelId = model_router.choose(model_configs, required_capabilities(messages, request_data.capabilities))
+        request_data.modelId = modelId
+
+    config = model_configs.get(modelId)
+    if not config:
+        raise HTTPException(status_code=400, detail=f"Invalid model ID: {modelId}")
+
+    # Attachments are downloaded concurrently and cached across turns; images are
+    # downscaled to what the model can use
+    attachments = await attachment_fetcher.prefetch(messages, config.get("image_max_side", IMAGE_MAX_SIDE))
+    openai_messages = convert_to_openai_messages(messages, attachments)
+
+    telemetry = StreamTelemetry(modelId, protocol)
+
+    # Wait for a completion slot before the response starts, so overload gets a real 429/503
+    try:
+        slot = await admission.acquire(modelId, config)
+    except HTTPException as he:
+        telemetry.end(he)
+        raise
+    telemetry.admitted()
+
+    # Create a helper function to capture the assistant's response while streaming
+    async def response_generator(stream):
+        content_parts = []
+        tool_invocations = {}
+        error = None
+
+        async def observed():
+            # Telemetry and the saved answer see every provider delta, before coalescing
+            try:
+                async for event in stream:
+                    if type(event) is TextDelta:
+                        content_parts.append(event.text)
+                        telemetry.token()
+                    elif type(event) is ToolCall:
+                        tool_invocations[event.id] = tool_invocation(event)
+                    elif type(event) is ToolResult and event.id in tool_invocations:
+                        result = event.result
+                        tool_invocations[event.id]["result"] = result if isinstance(result, dict) else {"result": result}
+                    elif type(event) is Finish:
+                        telemetry.usage(event.prompt_tokens, event.completion_tokens)
+                    yield event
+            finally:
+                # Closing early aborts the provider stream right away
+                await stream.aclose()
+
+        try:
+            async for event in coalesce(observed()):
+                frame = encode_event(event, protocol)
+                if frame:
+                    yield frame
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            slot.release()
+            telemetry.end(error)
+
+        full_content = "".join(content_parts)
+
+        # Save the new rows of this turn when streaming is done
+        completed_tools = [invocation for invocation in tool_invocations.values()
+                           if "result" in invocation and isinstance(invocation["args"], dict)]
+        if persist and (full_content or completed_tools):
+            assistant_message = ClientMessage(role="assistant", content=full_content,
+                                              toolInvocations=completed_tools or None)
+            turn = new_messages + [assistant_message]
+            if request_data.message:
+                await conversations.append(chatId, turn)
+            else:
+                await conversations.replace(chatId, messages + [assistant_message])
+
+            # Persisted in bulk by the write-behind queue, off the response path
+            message_queue.enqueue([message_row(chatId, msg) for msg in turn])
+
+    # Generate the streaming response with our wrapper to capture content
+    stream = stream_text(openai_messages, modelId, telemetry)
+    return response_generator(stream)
+
 @router.post("/api/chat")
-async def handle_chat_data(request_data: ChatRequest, protocol: str = Query('data')):
+async def handle_chat_data(request_data: ChatRequest, protocol: str = Query('data'), user = Depends(get_current_user)):
         try:
             print(f"Received request: {request_data}")
-            messages = request_data.messages
-            modelId = request_data.modelId
-            
-            # Handle both direct messages and initialMessages
-            if not messages and request_data.initialMessages:
-                messages = request_data.initialMessages
-                
-            openai_messages = convert_to_openai_messages(messages)
-
-            # Create a buffer to store the assistant's response
-            ai_response_buffer = []
-            
-            # Create a helper function to capture the assistant's response while streaming
-            async def response_generator(stream):
-                full_content = ""
-                for chunk in stream:
-                    yield chunk
-                    # For data protocol, extract content by checking for text content (0:)
-                    if protocol == 'data' and chunk.startswith('0:'):
-                        try:
-                            # Extract and unescape the content
-                            content_json = chunk[2:].strip()
-                            if content_json:
-                                content = json.loads(json.loads(content_json))
-                                if content:
-                                    full_content += content
-                        except Exception as e:
-                            print(f"Error parsing chunk: {e}")
-                    # For text protocol, directly append
-                    elif protocol == 'text':
-                        full_content += chunk
-                
-                # Save the complete AI response when streaming is done
-                if request_data.chatId and full_content:
-                    ai_message = {
-                        "role": "assistant",
-                        "content": full_content,
-                        "chat_id": request_data.chatId
-                    }
-                    ai_response_buffer.append(ai_message)
-                    
-                    # Now save both user and AI messages
-                    try:
-                        # First save user messages
-                        user_messages = [{
-                            "role": "user",
-                            "content": msg.content,
-                            "chat_id": request_data.chatId
-                        } for msg in messages if msg.role == "user"]
-                        
-                        # Combine with AI response 
-                        all_messages = user_messages + ai_response_buffer
-                        
-                        # Save to database
-                        await mutations.save_messages(request_data.chatId, all_messages)
-                    except Exception as e:
-                        print(f"Error saving messages: {str(e)}")
-            
-            # Generate the streaming response with our wrapper to capture content
-            stream = stream_text(openai_messages, protocol, modelId)
-            response = StreamingResponse(response_generator(stream))
+            frames = await chat_turn(request_data, user, protocol)
+            chatId = request_data.chatId
+
+            # Buffer the turn in Redis so a dropped client can resume it with the stream id
+            stream_id = None
+            if chatId and protocol == 'data' and stream_buffer.enabled:
+                stream_id = uuid.uuid4().hex
+                frames = stream_buffer.detach(chatId, stream_id, frames)
+
+            response = StreamingResponse(frames)
             response.headers['x-vercel-ai-data-stream'] = 'v1'
+            response.headers['x-model-id'] = request_data.modelId
+            if stream_id:
+                response.headers['x-stream-id'] = stream_id
             return response
-            
+
+        except HTTPException as he:
+            raise he
         except Exception as e:
             print(f"Error handling chat request: {str(e)}")
             raise HTTPException(status_code=500, detail=f"Error handling chat request: {str(e)}")
 
+@router.websocket("/api/chat/ws")
+async def chat_socket(websocket: WebSocket):
+    """
+    Chat over one WebSocket: authenticate once, then run several turns concurrently.
+
+    Client messages are JSON:
+      {"type": "auth", "token": "<jwt>"}                       first message, answered with {"type": "ready"}
+      {"type": "chat", "id": "<stream id>", ...ChatRequest}    start a turn
+      {"type": "cancel", "id": "<stream id>"}                  abort a turn and its provider stream
+    Server messages carry the stream id: {"type": "frame", "id", "frame"} with a data-stream
+    frame, then {"type": "done", "id"}, {"type": "cancelled", "id"} or {"type": "error", "id", "status", "detail"}.
+    """
+    await websocket.accept()
+    try:
+        auth = await asyncio.wait_for(websocket.receive_json(), WS_AUTH_TIMEOUT)
+        if auth.get("type") != "auth" or not auth.get("token"):
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Expected an auth message")
+        user = await get_current_user(HTTPAuthorizationCredentials(scheme="Bearer", credentials=auth["token"]))
+    except (HTTPException, asyncio.TimeoutError, ValueError):
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    except WebSocketDisconnect:
+        return
+
+    send_lock = asyncio.Lock()
+    streams = {}
+
+    async def send(message: dict) -> None:
+        async with send_lock:
+            await websocket.send_json(message)
+
+    async def run_turn(stream_id: str, request_data: ChatRequest) -> None:
+        try:
+            frames = await chat_turn(request_data, user)
+            try:
+                async for frame in frames:
+                    await send({"type": "frame", "id": stream_id, "frame": frame})
+            finally:
+                await frames.aclose()
+            await send({"type": "done", "id": stream_id})
+        except asyncio.CancelledError:
+            await send({"type": "cancelled", "id": stream_id})
+        except HTTPException as he:
+            await send({"type": "error", "id": stream_id, "status": he.status_code, "detail": he.detail})
+        except Exception as e:
+            print(f"Error in chat socket stream {stream_id}: {str(e)}")
+            await send({"type": "error", "id": stream_id, "status": 500, "detail": str(e)})
+        finally:
+            streams.pop(stream_id, None)
+
+    await send({"type": "ready"})
+    try:
+        while True:
+            try:
+                message = json.loads(await websocket.receive_text())
+                if not isinstance(message, dict):
+                    raise ValueError("expected an object")
+            except ValueError as e:
+                await send({"type": "error", "id": None, "status": 400, "detail": f"Invalid message: {str(e)}"})
+                continue
+            stream_id = str(message.get("id") or "")
+            kind = message.get("type")
+
+            if kind == "cancel":
+                task = streams.get(stream_id)
+                if task:
+                    task.cancel()
+            elif kind == "chat":
+                if not stream_id or stream_id in streams:
+                    await send({"type": "error", "id": stream_id, "status": 400, "detail": "A unique stream id is required"})
+                elif len(streams) >= WS_MAX_STREAMS:
+                    await send({"type": "error", "id": stream_id, "status": 429,
+                                "detail": f"At most {WS_MAX_STREAMS} concurrent streams per connection"})
+                else:
+                    try:
+                        request_data = ChatRequest(**{k: v for k, v in message.items() if k not in ("type", "id")})
+                    except ValidationError as e:
+                        await send({"type": "error", "id": stream_id, "status": 422, "detail": e.errors(include_url=False)})
+                        continue
+                    streams[stream_id] = asyncio.create_task(run_turn(stream_id, request_data))
+            else:
+                await send({"type": "error", "id": stream_id, "status": 400, "detail": f"Unknown message type: {kind}"})
+    except WebSocketDisconnect:
+        pass
+    finally:
+        # Abort everything still running on this connection so provider capacity is freed
+        tasks = list(streams.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+@router.get("/api/chat/router")
+async def get_router_stats():
+    """Live per-model latency stats and recent routing decisions of the `auto` model"""
+    return model_router.stats()
+
+@router.get("/api/chat/{chat_id}/stream/{stream_id}")
+async def resume_chat_stream(chat_id: str, stream_id: str, offset: int = Query(0, ge=0), user = Depends(get_current_user)):
+    """Replay a buffered chat turn after `offset` frames, then follow it live until it completes"""
+    # Only the chat's owner may replay its turns; the stream id alone travels in headers and logs
+    if not await owned_chat(chat_id, user):
+        raise HTTPException(status_code=404, detail="Stream not found or expired")
+    frames = await stream_buffer.resume(chat_id, stream_id, offset)
+    if frames is None:
+        raise HTTPException(status_code=404, detail="Stream not found or expired")
+
+    response = StreamingResponse(frames)
+    response.headers['x-vercel-ai-data-stream'] = 'v1'
+    response.headers['x-stream-id'] = stream_id
+    return response
+
+
+async def complete(messages: List[ClientMessage], modelId: str, config: dict) -> dict:
+    """Run one prompt through the chat pipeline and collect the whole answer"""
+    attachments = await attachment_fetcher.prefetch(messages, config.get("image_max_side", IMAGE_MAX_SIDE))
+    openai_messages = convert_to_openai_messages(messages, attachments)
+
+    # Offline work can wait out a busy model instead of failing the item
+    for attempt in range(BATCH_ADMISSION_RETRIES + 1):
+        try:
+            slot = await admission.acquire(modelId, config)
+            break
+        except HTTPException as he:
+            if he.status_code != status.HTTP_429_TOO_MANY_REQUESTS or attempt == BATCH_ADMISSION_RETRIES:
+                raise
+            await asyncio.sleep(float(he.headers.get("Retry-After", "1")) * (attempt + 1))
+
+    telemetry = StreamTelemetry(modelId, "batch")
+    telemetry.admitted()
+    content_parts = []
+    tool_invocations = {}
+    result = {}
+    error = None
+    try:
+        async for event in stream_text(openai_messages, modelId, telemetry):
+            if type(event) is TextDelta:
+                content_parts.append(event.text)
+                telemetry.token()
+            elif type(event) is ToolCall:
+                tool_invocations[event.id] = tool_invocation(event)
+            elif type(event) is ToolResult:
+                tool_invocations[event.id]["result"] = event.result
+            elif type(event) is Finish:
+                telemetry.usage(event.prompt_tokens, event.completion_tokens)
+                result["finishReason"] = event.reason
+                result["usage"] = {"promptTokens": event.prompt_tokens, "completionTokens": event.completion_tokens}
+    except Exception as e:
+        error = e
+        raise
+    finally:
+        slot.release()
+        telemetry.end(error)
+
+    result["content"] = "".join(content_parts)
+    if tool_invocations:
+        result["toolInvocations"] = list(tool_invocations.values())
+    return result
+
+@router.post("/api/chat/batch")
+async def handle_chat_batch(request_data: BatchRequest, user = Depends(get_current_user)):
+    """
+    Run many independent prompts against one model with bounded concurrency.
+    Results stream back as NDJSON in completion order; each line carries the item's
+    index and id, and failed items carry an `error` instead of an answer.
+    """
+    modelId = request_data.modelId
+    if modelId != AUTO_MODEL_ID and modelId not in model_configs:
+        raise HTTPException(status_code=400, detail=f"Invalid model ID: {modelId}")
+    if not request_data.items:
+        raise HTTPException(status_code=400, detail="No items provided")
+    if len(request_data.items) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"A batch may contain at most {BATCH_MAX_ITEMS} items")
+
+    concurrency = max(1, min(request_data.concurrency or BATCH_CONCURRENCY, BATCH_MAX_CONCURRENCY))
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run(index: int, item: BatchItem) -> dict:
+        line = {"index": index, "id": item.id}
+        if not item.messages:
+            line["error"] = {"status": 400, "detail": "No messages provided"}
+            return line
+        async with semaphore:
+            try:
+                # With `auto`, each item is routed on its own as latency stats evolve
+                item_model = modelId
+                if modelId == AUTO_MODEL_ID:
+                    item_model = model_router.choose(model_configs, required_capabilities(item.messages, []))
+                line["modelId"] = item_model
+                line.update(await complete(item.messages, item_model, model_configs[item_model]))
+            except HTTPException as he:
+                line["error"] = {"status": he.status_code, "detail": he.detail}
+            except Exception as e:
+                line["error"] = {"status": 500, "detail": str(e)}
+        return line
+
+    async def lines():
+        tasks = [asyncio.create_task(run(index, item)) for index, item in enumerate(request_data.items)]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield json.dumps(await next_done) + "\n"
+        finally:
+            # The client went away; stop the remaining completions
+            for task in tasks:
+                task.cancel()
 
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
 
 
 @router.post("/new-chat")
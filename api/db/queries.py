@@ -91,12 +91,22 @@ class DatabaseQueries:
         
         return len(response.data) > 0
 
+    def get_chat(self, id: str) -> Optional[Dict[str, Any]]:
+        """Get a chat by ID"""
+        response = self.supabase.table("chats").select("id, user_id").eq("id", id).limit(1).execute()
+        return response.data[0] if response.data else None
+
     # Message operations
     def get_messages(self, chatId: str, limit: int = 100) -> List[Dict[str, Any]]:
         """Get all messages for a chat"""
         response = self.supabase.table("messages").select("*").eq("chat_id", chatId).order("created_at").limit(limit).execute()
         return response.data if response.data else []
 
+    def get_latest_messages(self, chatId: str, limit: int = 100) -> List[Dict[str, Any]]:
+        """Get the most recent messages of a chat, oldest first"""
+        response = self.supabase.table("messages").select("*").eq("chat_id", chatId).order("created_at", desc=True).limit(limit).execute()
+        return list(reversed(response.data)) if response.data else []
+
     def save_message(self, message: Dict[str, Any]) -> Dict[str, Any]:
         """Save a single message"""
         if "created_at" not in message:
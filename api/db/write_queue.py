@@ -0,0 +1,148 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from client import supabase
+from db.queries import DatabaseQueries
+
+logger = logging.getLogger(__name__)
+
+
+class MessageWriteQueue:
+    """
+    Write-behind buffer for chat message rows.
+    Rows from all chats are flushed as bulk inserts when the buffer reaches
+    `batch_size` or every `flush_interval` seconds, keeping database latency
+    off the streaming response path.
+    """
+
+    def __init__(self, db: DatabaseQueries, batch_size: int = None, flush_interval: float = None, max_retries: int = None):
+        self.db = db
+        self.batch_size = batch_size or int(os.getenv("MESSAGE_QUEUE_BATCH_SIZE", "100"))
+        self.flush_interval = flush_interval or float(os.getenv("MESSAGE_QUEUE_FLUSH_INTERVAL", "0.5"))
+        self.max_retries = max_retries or int(os.getenv("MESSAGE_QUEUE_MAX_RETRIES", "3"))
+        self._buffer: List[Dict] = []
+        self._inflight: List[Dict] = []
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+        self._last_stamp = datetime.min
+
+        self.enqueued = 0
+        self.written = 0
+        self.dropped = 0
+        # Chats with rows that never reached the table; their stored history is incomplete
+        self.dropped_chats: set = set()
+        self.flushes = 0
+        self.last_flush_latency = 0.0
+        self.max_flush_latency = 0.0
+        self._total_flush_latency = 0.0
+
+    def enqueue(self, rows: List[Dict]) -> None:
+        """Buffer message rows for the next bulk insert"""
+        for row in rows:
+            if "role" not in row or "content" not in row:
+                continue
+            row = dict(row)
+            if isinstance(row["content"], (dict, list)):
+                row["content"] = json.dumps(row["content"])
+            # Stamp on enqueue so rows keep their order however late they are flushed; stamps are
+            # strictly increasing, since history is ordered by created_at alone
+            if "created_at" not in row:
+                row["created_at"] = self._next_stamp()
+            self._buffer.append(row)
+            self.enqueued += 1
+
+        if self._task is None:
+            # Not started by the lifespan hook; flush in the background instead of holding rows forever
+            asyncio.get_running_loop().create_task(self.flush())
+        elif len(self._buffer) >= self.batch_size:
+            self._wakeup.set()
+
+    def pending(self, chat_id: str) -> List[Dict]:
+        """Rows of a chat not yet written: buffered, or in a batch that is being written or retried"""
+        return [row for row in self._inflight + self._buffer if row.get("chat_id") == chat_id]
+
+    def _next_stamp(self) -> str:
+        self._last_stamp = max(datetime.utcnow(), self._last_stamp + timedelta(microseconds=1))
+        return self._last_stamp.isoformat()
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+            logger.info("Message write queue started")
+
+    async def stop(self) -> None:
+        """Stop the flush loop and drain everything still buffered"""
+        if self._task is not None:
+            # Let an in-flight flush finish its retries rather than cancelling it mid-batch
+            self._stopping = True
+            self._wakeup.set()
+            await self._task
+            self._task = None
+            self._stopping = False
+        await self.flush()
+        logger.info(f"Message write queue drained, {self.dropped} rows dropped in total")
+
+    async def _run(self) -> None:
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    async def flush(self) -> None:
+        """Write buffered rows in batches of at most batch_size"""
+        async with self._flush_lock:
+            while self._buffer:
+                batch = self._buffer[:self.batch_size]
+                del self._buffer[:self.batch_size]
+                self._inflight = batch
+                try:
+                    await self._write(batch)
+                finally:
+                    self._inflight = []
+
+    async def _write(self, batch: List[Dict]) -> None:
+        started = time.perf_counter()
+        for attempt in range(1, self.max_retries + 1):
+            try:
+                await asyncio.to_thread(self.db.save_messages, batch)
+                self.written += len(batch)
+                break
+            except Exception as e:
+                logger.error(f"Failed to write {len(batch)} messages (attempt {attempt}/{self.max_retries}): {str(e)}")
+                if attempt == self.max_retries:
+                    self.dropped += len(batch)
+                    self.dropped_chats.update(row.get("chat_id") for row in batch)
+                else:
+                    await asyncio.sleep(0.5 * 2 ** (attempt - 1))
+
+        latency = time.perf_counter() - started
+        self.flushes += 1
+        self.last_flush_latency = latency
+        self.max_flush_latency = max(self.max_flush_latency, latency)
+        self._total_flush_latency += latency
+
+    def stats(self) -> dict:
+        return {
+            "depth": len(self._buffer),
+            "enqueued": self.enqueued,
+            "written": self.written,
+            "dropped": self.dropped,
+            "flushes": self.flushes,
+            "last_flush_latency": self.last_flush_latency,
+            "max_flush_latency": self.max_flush_latency,
+            "avg_flush_latency": self._total_flush_latency / self.flushes if self.flushes else 0.0,
+        }
+
+
+# Create a singleton instance
+message_queue = MessageWriteQueue(DatabaseQueries(supabase))
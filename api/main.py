@@ -11,11 +11,26 @@ from dotenv import load_dotenv
 from opentelemetry.instrumentation.fastapi import FastAPIInstrumentor
 
 # Import routers
-from chat import router as chat_router
+from chat import router as chat_router, model_configs
 from vote import router as vote_router
-from upload import router as upload_router
+from upload import router as upload_router, BUCKETS
 from agents.routes import router as agent_router
 from utils.auth import get_current_user
+from utils.tool_executor import tool_executor
+from utils.tool_cache import tool_cache
+from utils.response_cache import response_cache
+from db.write_queue import message_queue
+from utils.context import context_window
+from utils.hedging import hedger
+from utils.admission import admission
+from utils.stream_buffer import stream_buffer
+from utils.providers import provider_clients
+from utils.attachments import attachment_fetcher
+from utils.model_router import model_router
+from utils.storage_upload import storage_uploader
+from utils.buckets import bucket_registry
+from utils.previews import preview_worker
+from client import supabase
 from settings.config import settings
 
 load_dotenv()
@@ -29,12 +44,23 @@ async def lifespan(app: FastAPI):
     # Startup: Load models, establish connections, etc.
     logger.info("Starting up the API server...")
     
-    # Add startup logic here
+    await message_queue.start()
+    await provider_clients.start(model_configs)
+    bucket_registry.configure(BUCKETS)
+    await bucket_registry.provision(supabase)
+    await preview_worker.start()
     
     yield
     
     # Shutdown: Clean up resources
     logger.info("Shutting down the API server...")
+    await stream_buffer.shutdown()
+    await message_queue.stop()
+    await provider_clients.close()
+    await attachment_fetcher.close()
+    await preview_worker.stop()
+    await storage_uploader.close()
+    tool_executor.shutdown()
 
 app = FastAPI(
     title="Arenas API",
@@ -69,6 +95,21 @@ async def root():
 async def health_check():
     return {"status": "ok", "version": "1.0.0"}
 
+@app.get("/stats")
+async def get_stats():
+    """Runtime counters for caches and queues"""
+    return {
+        "tool_cache": tool_cache.stats(),
+        "response_cache": response_cache.stats(),
+        "message_queue": message_queue.stats(),
+        "context_window": context_window.stats(),
+        "hedging": hedger.stats(),
+        "admission": admission.stats(),
+        "attachments": attachment_fetcher.stats(),
+        "model_router": model_router.stats(),
+        "previews": preview_worker.stats(),
+    }
+
 @app.get("/me")
 async def get_me(user_id: str = Depends(get_current_user)):
     return {"user_id": user_id}
@@ -47,26 +47,61 @@ def initialize_model_configs() -> Dict[str, Dict[str, Any]]:
             "provider": "openai",
             "model": "gpt-4o",
             "api_key": os.getenv("OPENAI_API_KEY"),
+            "requires_subscription": True,
+            "response_cache": False,
+            "context_budget": 32000,  # Prompt tokens sent per request
+            "hedge": None,  # e.g. {"fallback": "claude-3-7-sonnet", "deadline": 3.0}
+            "image_max_side": 2048,  # Longest image edge sent to the model; None passes image URLs through
+            "capabilities": ["tools", "vision"],
+            "auto_route": True,  # Candidate for modelId "auto"
         },
         "claude-3-7-sonnet": {
             "provider": "anthropic",
             "model": "claude-3-7-sonnet-20250219",
             "api_key": os.getenv("ANTHROPIC_API_KEY"),
+            "requires_subscription": True,
+            "response_cache": False,
+            "context_budget": 48000,
+            "hedge": None,
+            "image_max_side": 1568,
+            "capabilities": ["tools", "vision"],
+            "auto_route": True,
         },
         "deepseek-reasoner": {
             "provider": "deepseek",
             "model": "deepseek-chat",  
             "api_key": os.getenv("DEEPSEEK_API_KEY"),
+            "requires_subscription": False,
+            "response_cache": False,
+            "context_budget": 32000,
+            "hedge": None,
+            "image_max_side": None,
+            "capabilities": ["tools"],
+            "auto_route": True,
         },
         "gemini-2.5-pro": {
             "provider": "google",
             "model": "gemini-2.5-pro",
             "api_key": os.getenv("GOOGLE_API_KEY"),
+            "requires_subscription": True,
+            "response_cache": False,
+            "context_budget": 64000,
+            "hedge": None,
+            "image_max_side": 1536,
+            "capabilities": ["tools", "vision"],
+            "auto_route": True,
         },
         "gpt-4.5": {
             "provider": "openai",
             "model": "gpt-4.5-preview",
             "api_key": os.getenv("OPENAI_API_KEY"),
+            "requires_subscription": True,
+            "response_cache": False,
+            "context_budget": 16000,
+            "hedge": None,
+            "image_max_side": 2048,
+            "capabilities": ["tools", "vision"],
+            "auto_route": False,
         }
     }
 
@@ -1,10 +1,15 @@
-from fastapi import FastAPI, UploadFile, Form, HTTPException, Request, APIRouter
-from typing import Optional, Dict, Any, List
-import os
+from fastapi import UploadFile, Form, HTTPException, Request, APIRouter
+from typing import Optional, List
 import uuid
 import logging
-from supabase import create_client, Client
+from supabase import Client
 from datetime import datetime
+from urllib.parse import unquote, urlparse
+from client import supabase
+from utils.buckets import bucket_registry
+from utils.storage_upload import storage_uploader
+from utils.ingest import columnar_path
+from utils.previews import preview_worker, preview_kind, thumbnail_path
 
 
 router = APIRouter()
@@ -22,6 +27,18 @@ ALLOWED_MIME_TYPES = [
     'application/json'
 ]
 
+BUCKET_OPTIONS = {
+    "public": True,
+    "file_size_limit": 52428800,
+    "allowed_mime_types": ALLOWED_MIME_TYPES
+}
+
+# Provisioned once at startup
+BUCKETS = {
+    "data-files": BUCKET_OPTIONS,
+    "chat_attachments": BUCKET_OPTIONS,
+}
+
 def check_supabase_error(result, operation_name="operation"):
     """Helper function to check for errors in Supabase responses"""
     if hasattr(result, 'error') and result.error:
@@ -57,15 +74,13 @@ def sanitize_filename(filename: str) -> str:
     import re
     return re.sub(r'[^a-zA-Z0-9.-]', '_', filename).lower()
 
-def create_supabase_client() -> Client:
-    """Create and return a Supabase client."""
-    url = os.environ.get("NEXT_PUBLIC_SUPABASE_URL")
-    key = os.environ.get("NEXT_PUBLIC_SUPABASE_ANON_KEY")
-    
-    if not url or not key:
-        raise ValueError("Missing Supabase credentials")
-    
-    return create_client(url, key)
+def storage_object(public_url: str) -> Optional[tuple]:
+    """The (bucket, path) of the object behind a public storage URL"""
+    _, found, rest = urlparse(public_url).path.partition("/storage/v1/object/public/")
+    if not found:
+        return None
+    bucket, _, path = rest.partition("/")
+    return bucket, unquote(path)
 
 async def upload_to_storage(
     supabase: Client,
@@ -76,15 +91,9 @@ async def upload_to_storage(
 ) -> str:
 
     file_path = '/'.join(path)
-    file_contents = await file.read()
-    
-    result = supabase.storage.from_(bucket).upload(
-        file_path,
-        file_contents,
-        {"content-type": content_type}
-    )
     
-    check_supabase_error(result, "Storage upload")
+    # Streamed in fixed-size chunks, resumable for large files, instead of read into memory
+    await storage_uploader.upload(bucket, file_path, file, content_type)
     
     public_url = supabase.storage.from_(bucket).get_public_url(file_path)
     return public_url
@@ -112,9 +121,6 @@ async def upload_file(
         if not chat_id:
             raise HTTPException(status_code=400, detail="No chatId provided")
         
-        # Get Supabase client
-        supabase = create_supabase_client()
-        
         # Get current user
         user_response = supabase.auth.get_user()
         check_supabase_error(user_response, "Authentication")
@@ -128,38 +134,46 @@ async def upload_file(
         
         logger.info(f"Upload request: {file.filename}, {file_type}, {chat_id}, {bucket_id}")
         
-        # Check if bucket exists, create if it doesn't
-        buckets = supabase.storage.list_buckets()
-        if bucket_id not in [b.id for b in buckets]:
-            logger.info(f"Creating {bucket_id} bucket...")
-            create_result = supabase.storage.create_bucket(
-                bucket_id,
-                {
-                    "public": True,
-                    "file_size_limit": 52428800,
-                    "allowed_mime_types": ALLOWED_MIME_TYPES
-                }
-            )
-            check_supabase_error(create_result, "Bucket creation")
+        # Buckets are provisioned at startup; this only creates one the registry has not seen
+        await bucket_registry.ensure(supabase, bucket_id)
 
         # Upload file
         file_id = str(uuid.uuid4())
         sanitized_filename = sanitize_filename(file.filename)
         file_path = [user.id, chat_id, sanitized_filename]
         
-        logger.info(f"Attempting file upload: {bucket_id}, {file_type}, {'/'.join(file_path)}")
+        path_str = '/'.join(file_path)
+        
+        # Skip the storage write when this user already uploaded the same content
+        content_hash = await storage_uploader.content_hash(file)
+        duplicate = supabase.table('file_uploads').select('url, preview_data') \
+            .eq('user_id', user.id) \
+            .eq('content_hash', content_hash) \
+            .limit(1) \
+            .execute()
         
-        # Upload the file and get public URL
-        public_url = await upload_to_storage(
-            supabase,
-            file,
-            file_path,
-            bucket_id,
-            file_type
-        )
+        dimensions = None
+        columnar_url = None
+        previous_preview = {}
+        if duplicate.data:
+            logger.info(f"Reusing stored content {content_hash} for {path_str}")
+            public_url = duplicate.data[0]['url']
+            previous_preview = duplicate.data[0].get('preview_data') or {}
+            dimensions = previous_preview.get('dimensions')
+            columnar_url = previous_preview.get('columnar')
+        else:
+            logger.info(f"Attempting file upload: {bucket_id}, {file_type}, {path_str}")
+            
+            # Upload the file and get public URL
+            public_url = await upload_to_storage(
+                supabase,
+                file,
+                file_path,
+                bucket_id,
+                file_type
+            )
         
         # Check if file exists in the database
-        path_str = '/'.join(file_path)
         existing_file = supabase.table('file_uploads').select('url') \
             .eq('user_id', user.id) \
             .eq('chat_id', chat_id) \
@@ -180,6 +194,28 @@ async def upload_file(
         file_size = file.size
         preview_type = "spreadsheet" if is_spreadsheet else "image" if file_type.startswith("image/") else "file"
         icon = None if file_type.startswith("image/") else "FileSpreadsheet" if is_spreadsheet else "FileText"
+        preview = {
+            "type": preview_type,
+            "name": file.filename,
+            "size": file_size,
+            "contentType": file_type,
+            "lastModified": datetime.now().isoformat(),
+            "dimensions": dimensions,
+            "thumbnail": None,
+            "icon": icon,
+            "columnar": columnar_url
+        }
+        
+        # Thumbnails, snippets and the columnar copy of spreadsheets are produced in the background;
+        # content seen before reuses its preview
+        kind = preview_kind(file_type, file.filename, is_spreadsheet)
+        if previous_preview.get("previewStatus") == "ready":
+            preview.update({key: previous_preview.get(key) for key in ("thumbnail", "snippet", "previewStatus")})
+            kind = None
+        elif kind:
+            preview["previewStatus"] = "pending"
+        elif file_type.startswith("image/"):
+            preview["thumbnail"] = public_url
         
         insert_result = supabase.table('file_uploads').insert({
             "user_id": user.id,
@@ -191,39 +227,43 @@ async def upload_file(
             "content_type": file_type,
             "size": file_size,
             "url": public_url,
+            "content_hash": content_hash,
             "version": 1,
             "is_spreadsheet": is_spreadsheet,
-            "preview_data": {
-                "type": preview_type,
-                "name": file.filename,
-                "size": file_size,
-                "contentType": file_type,
-                "lastModified": datetime.now().isoformat(),
-                "dimensions": None,
-                "thumbnail": public_url if file_type.startswith("image/") else None,
-                "icon": icon
-            }
+            "preview_data": preview
         }).execute()
         
         check_supabase_error(insert_result, "Database insert")
         
         logger.info("File record created successfully")
         
+        if kind:
+            # Derived files go next to the stored object, which deduplicated rows share with the original
+            object_bucket, object_path = storage_object(public_url) or (bucket_id, path_str)
+            job = {
+                "kind": kind,
+                "user_id": user.id,
+                "chat_id": chat_id,
+                "storage_path": path_str,
+                "object_bucket": object_bucket,
+                "object_path": object_path,
+                "url": public_url,
+                "filename": file.filename,
+                "content_type": file_type,
+                "preview": dict(preview),
+            }
+            if not preview_worker.submit(job):
+                # The queue is full; record the failure rather than leave the row pending
+                await preview_worker.fail(job)
+                preview = job["preview"]
+        
         return {
             "url": public_url,
             "path": path_str,
             "isSpreadsheet": is_spreadsheet,
             "fileId": file_id,
-            "preview": {
-                "type": preview_type,
-                "name": file.filename,
-                "size": file_size,
-                "contentType": file_type,
-                "lastModified": datetime.now().isoformat(),
-                "dimensions": None,
-                "thumbnail": public_url if file_type.startswith("image/") else None,
-                "icon": icon
-            }
+            "deduplicated": bool(duplicate.data),
+            "preview": preview
         }
         
     except Exception as e:
@@ -240,19 +280,19 @@ async def delete_file(request: Request):
         if not chat_id or not path:
             raise HTTPException(status_code=400, detail="Missing required fields")
         
-        supabase = create_supabase_client()
-        
         # Get current user
         user_response = supabase.auth.get_user()
         check_supabase_error(user_response, "Authentication")
         
         user = user_response.user
         
-        # Delete from storage
         full_path = f"{user.id}/{chat_id}/{path}"
-        storage_result = supabase.storage.from_('chat_attachments').remove([full_path])
-        
-        check_supabase_error(storage_result, "Storage removal")
+        record = supabase.table('file_uploads').select('url, bucket_id') \
+            .eq('user_id', user.id) \
+            .eq('chat_id', chat_id) \
+            .eq('storage_path', full_path) \
+            .limit(1) \
+            .execute()
         
         # Delete from database
         db_result = supabase.table('file_uploads').delete() \
@@ -263,6 +303,25 @@ async def delete_file(request: Request):
             
         check_supabase_error(db_result, "Database removal")
         
+        # Deduplicated rows point at another upload's object, so the object is found through the
+        # URL and deleted only once no row references it any more
+        url = record.data[0]['url'] if record.data else None
+        location = storage_object(url) if url else None
+        if location is None:
+            location = (record.data[0]['bucket_id'] if record.data else 'chat_attachments', full_path)
+        bucket_id, object_path = location
+        shared = url and supabase.table('file_uploads').select('id') \
+            .eq('user_id', user.id) \
+            .eq('url', url) \
+            .limit(1) \
+            .execute().data
+        
+        if not shared:
+            # Derived files sit next to the original: spreadsheets and PDFs in data-files, other uploads in chat_attachments
+            storage_result = supabase.storage.from_(bucket_id).remove(
+                [object_path, columnar_path(object_path), thumbnail_path(object_path)])
+            check_supabase_error(storage_result, "Storage removal")
+        
         return {"success": True}
         
     except Exception as e:
@@ -0,0 +1,195 @@
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+
+from fastapi import HTTPException, status
+
+logger = logging.getLogger(__name__)
+
+MODEL_CONCURRENCY = int(os.getenv("ADMISSION_MODEL_CONCURRENCY", "16"))
+TIER_CONCURRENCY = {
+    "pro": int(os.getenv("ADMISSION_PRO_CONCURRENCY", "48")),
+    "free": int(os.getenv("ADMISSION_FREE_CONCURRENCY", "16")),
+}
+MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", "32"))
+QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "10"))
+
+
+class QueueFull(Exception):
+    pass
+
+
+class Limiter:
+    """Concurrency limit with a bounded FIFO wait queue"""
+
+    def __init__(self, limit: int, max_queue: int):
+        self.limit = limit
+        self.max_queue = max_queue
+        self.active = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    @property
+    def queued(self) -> int:
+        return sum(1 for waiter in self._waiters if not waiter.done())
+
+    def try_acquire(self) -> bool:
+        if self.active < self.limit and not self.queued:
+            self.active += 1
+            return True
+        return False
+
+    async def acquire(self, timeout: float) -> None:
+        if self.try_acquire():
+            return
+        if self.queued >= self.max_queue:
+            raise QueueFull()
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter, timeout)
+        except BaseException:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just as we gave up; pass it on
+                self.release()
+            raise
+        finally:
+            if waiter in self._waiters and waiter.done():
+                self._waiters.remove(waiter)
+
+    def release(self) -> None:
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)  # Hand the slot straight to the next waiter
+                return
+        self.active -= 1
+
+
+class Admission:
+    """A granted completion slot; release() is idempotent"""
+
+    def __init__(self, model_limiter: Limiter, tier_limiter: Limiter):
+        self._limiters = [model_limiter, tier_limiter]
+
+    def release(self) -> None:
+        while self._limiters:
+            self._limiters.pop().release()
+
+
+class AdmittedStream:
+    """A provider stream that holds an admission slot until it is closed"""
+
+    def __init__(self, stream: Any, slot: Admission):
+        self.stream = stream
+        self.slot = slot
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        return await self.stream.__anext__()
+
+    async def aclose(self) -> None:
+        try:
+            await self.stream.aclose()
+        finally:
+            self.slot.release()
+
+
+class AdmissionController:
+    """
+    Caps concurrent completions per model and per subscription tier.
+    Models with `requires_subscription` draw on the pro pool, others on the free pool,
+    so a burst of free traffic cannot take capacity from paid models. A model config
+    may override its own limit with `max_concurrency`. Requests beyond the limits wait
+    in a bounded queue; a full queue is rejected with 429 and a wait longer than
+    the queue timeout with 503.
+    """
+
+    def __init__(self):
+        self.models: Dict[str, Limiter] = {}
+        self.tiers = {tier: Limiter(limit, MAX_QUEUE * 2) for tier, limit in TIER_CONCURRENCY.items()}
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.queue_waits: Deque[float] = deque(maxlen=1000)
+
+    @staticmethod
+    def tier_for(config: dict) -> str:
+        return "pro" if config.get("requires_subscription") else "free"
+
+    def _model_limiter(self, model_id: str, config: dict) -> Limiter:
+        if model_id not in self.models:
+            self.models[model_id] = Limiter(config.get("max_concurrency", MODEL_CONCURRENCY), MAX_QUEUE)
+        return self.models[model_id]
+
+    async def acquire(self, model_id: str, config: dict) -> Admission:
+        """Wait for a completion slot for a model"""
+        model_limiter = self._model_limiter(model_id, config)
+        tier_limiter = self.tiers[self.tier_for(config)]
+        started = time.perf_counter()
+
+        try:
+            await model_limiter.acquire(QUEUE_TIMEOUT)
+            try:
+                await tier_limiter.acquire(max(QUEUE_TIMEOUT - (time.perf_counter() - started), 0.001))
+            except BaseException:
+                model_limiter.release()
+                raise
+        except QueueFull:
+            self.rejected += 1
+            logger.warning(f"Admission queue full for {model_id}")
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail=f"Too many concurrent requests for {model_id}, please retry shortly",
+                headers={"Retry-After": "1"}
+            )
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            logger.warning(f"Admission wait for {model_id} exceeded {QUEUE_TIMEOUT}s")
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail=f"{model_id} is at capacity, please retry shortly",
+                headers={"Retry-After": str(int(QUEUE_TIMEOUT))}
+            )
+
+        self.admitted += 1
+        self.queue_waits.append(time.perf_counter() - started)
+        return Admission(model_limiter, tier_limiter)
+
+    def try_acquire(self, model_id: str, config: dict) -> Optional[Admission]:
+        """A completion slot if one is free right now, without queueing; None otherwise"""
+        model_limiter = self._model_limiter(model_id, config)
+        tier_limiter = self.tiers[self.tier_for(config)]
+        if not model_limiter.try_acquire():
+            return None
+        if not tier_limiter.try_acquire():
+            model_limiter.release()
+            return None
+        self.admitted += 1
+        return Admission(model_limiter, tier_limiter)
+
+    def stats(self) -> dict:
+        waits = sorted(self.queue_waits)
+        return {
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "queue_wait": {
+                "avg": sum(waits) / len(waits) if waits else 0.0,
+                "p95": waits[int(len(waits) * 0.95)] if waits else 0.0,
+                "max": waits[-1] if waits else 0.0,
+            },
+            "models": {model_id: {"active": l.active, "queued": l.queued, "limit": l.limit}
+                       for model_id, l in self.models.items()},
+            "tiers": {tier: {"active": l.active, "queued": l.queued, "limit": l.limit}
+                      for tier, l in self.tiers.items()},
+        }
+
+
+# Create a singleton instance
+admission = AdmissionController()
@@ -0,0 +1,234 @@
+import asyncio
+import base64
+import functools
+import hashlib
+import io
+import logging
+import os
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import unquote_to_bytes, urlparse
+
+import httpx
+
+from utils.cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+try:
+    from PIL import Image, ImageOps
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+
+MAX_BYTES = int(os.getenv("ATTACHMENT_MAX_BYTES", str(256 * 1024)))
+TRUNCATED_MARKER = "\n[attachment truncated]"
+IMAGE_MAX_BYTES = int(os.getenv("ATTACHMENT_IMAGE_MAX_BYTES", str(20 * 1024 * 1024)))
+IMAGE_MAX_SIDE = int(os.getenv("ATTACHMENT_IMAGE_MAX_SIDE", "1568"))
+IMAGE_QUALITY = int(os.getenv("ATTACHMENT_IMAGE_QUALITY", "85"))
+PROVIDER_IMAGE_TYPES = {"image/jpeg", "image/png", "image/gif", "image/webp"}
+
+
+def _allowed_hosts() -> set:
+    hosts = os.getenv("ATTACHMENT_ALLOWED_HOSTS")
+    if hosts:
+        return {host.strip() for host in hosts.split(",") if host.strip()}
+    # By default only our own storage is fetched, so attachments cannot point the server elsewhere
+    supabase_host = urlparse(os.getenv("NEXT_PUBLIC_SUPABASE_URL") or "").hostname
+    return {supabase_host} if supabase_host else set()
+
+
+def _parse_data_url(url: str) -> Tuple[bytes, Optional[str]]:
+    header, _, payload = url.partition(",")
+    data = base64.b64decode(payload) if header.endswith(";base64") else unquote_to_bytes(payload)
+    charset = next((p.split("=", 1)[1] for p in header.split(";") if p.startswith("charset=")), None)
+    return data, charset
+
+
+def _decode_text(data: bytes, charset: Optional[str], truncated: bool) -> str:
+    text = data.decode(charset or "utf-8", errors="replace")
+    return text + TRUNCATED_MARKER if truncated else text
+
+
+def _downscale_image(data: bytes, charset: Optional[str], truncated: bool, max_side: int) -> Optional[str]:
+    """Fit an image within max_side and re-encode it compactly as a data URL"""
+    if truncated:
+        return None  # A partial image cannot be decoded; the provider fetches the original
+
+    try:
+        image = Image.open(io.BytesIO(data))
+        image.load()
+    except Exception as e:
+        logger.warning(f"Could not decode image attachment: {str(e)}")
+        return None
+
+    original_mime = Image.MIME.get(image.format)
+    fits = max(image.size) <= max_side
+    image = ImageOps.exif_transpose(image)
+    image.thumbnail((max_side, max_side), Image.LANCZOS)
+
+    output = io.BytesIO()
+    if image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info):
+        image.save(output, format="PNG", optimize=True)
+        mime = "image/png"
+    else:
+        image.convert("RGB").save(output, format="JPEG", quality=IMAGE_QUALITY, optimize=True)
+        mime = "image/jpeg"
+    encoded = output.getvalue()
+
+    # Small images that were already compact are passed through as they are
+    if fits and original_mime in PROVIDER_IMAGE_TYPES and len(data) <= len(encoded):
+        encoded, mime = data, original_mime
+    return f"data:{mime};base64,{base64.b64encode(encoded).decode()}"
+
+
+class AttachmentFetcher:
+    """
+    Fetches attachments server-side before a completion.
+    Text attachments are inlined, capped at ATTACHMENT_MAX_BYTES; images are downscaled
+    to the model's maximum resolution and re-encoded as a compact data URL (needs Pillow).
+    All attachments of a request are fetched concurrently. Derived content is cached by
+    content hash; URLs map to that hash together with their ETag and are revalidated with
+    If-None-Match once stale, so a file referenced on every turn is downloaded once.
+    """
+
+    def __init__(self, max_entries: int = None):
+        max_entries = max_entries or int(os.getenv("ATTACHMENT_CACHE_MAX_ENTRIES", "128"))
+        self.contents = LRUCache(max_entries)
+        self.urls = LRUCache(max_entries * 4)
+        self.fresh_for = float(os.getenv("ATTACHMENT_FRESH_SECONDS", "300"))
+        self.allowed_hosts = _allowed_hosts()
+        self._semaphore = asyncio.Semaphore(int(os.getenv("ATTACHMENT_CONCURRENCY", "8")))
+        self._http: Optional[httpx.AsyncClient] = None
+        self.downloads = 0
+        self.hits = 0
+        self.revalidated = 0
+
+    @property
+    def http(self) -> httpx.AsyncClient:
+        if self._http is None:
+            self._http = httpx.AsyncClient(
+                timeout=httpx.Timeout(float(os.getenv("ATTACHMENT_TIMEOUT", "10"))),
+                follow_redirects=False,
+            )
+        return self._http
+
+    def _derived(self, kind: str, data: bytes, derive: Callable[[bytes, Optional[str], bool], Optional[str]],
+                 charset: Optional[str], truncated: bool) -> Tuple[str, Optional[str]]:
+        """Derive content from raw bytes once per content hash; returns (cache key, content)"""
+        key = f"{kind}:{hashlib.sha256(data).hexdigest()}"
+        content = self.contents.get(key)
+        if content is None:
+            content = derive(data, charset, truncated)
+            if content is not None:
+                self.contents.set(key, content)
+        return key, content
+
+    async def _download(self, url: str, etag: Optional[str], max_bytes: int) -> Tuple[Optional[str], Optional[bytes], Optional[str], bool]:
+        """Return (etag, body, charset, truncated); body is None when the cached copy is still valid"""
+        headers = {"If-None-Match": etag} if etag else {}
+        async with self.http.stream("GET", url, headers=headers) as response:
+            if response.status_code == 304:
+                return etag, None, None, False
+            response.raise_for_status()
+
+            body = bytearray()
+            truncated = False
+            async for chunk in response.aiter_bytes():
+                body.extend(chunk)
+                if len(body) > max_bytes:
+                    # Stop reading; the rest of the file never crosses the wire
+                    del body[max_bytes:]
+                    truncated = True
+                    break
+            return response.headers.get("etag"), bytes(body), response.charset_encoding, truncated
+
+    async def _fetch(self, url: str, kind: str, max_bytes: int,
+                     derive: Callable[[bytes, Optional[str], bool], Optional[str]]) -> Optional[str]:
+        """Content derived from one attachment, or None if it cannot be fetched"""
+        if url.startswith("data:"):
+            try:
+                data, charset = _parse_data_url(url)
+                _, content = await asyncio.to_thread(
+                    self._derived, kind, data[:max_bytes], derive, charset, len(data) > max_bytes)
+                return content
+            except Exception as e:
+                logger.warning(f"Error decoding data URL attachment: {str(e)}")
+                return None
+
+        parsed = urlparse(url)
+        if parsed.scheme not in ("http", "https") or parsed.hostname not in self.allowed_hosts:
+            logger.warning(f"Not fetching attachment from disallowed host: {parsed.hostname}")
+            return None
+
+        url_key = f"{kind}:{url}"
+        etag, content_key, fetched_at = self.urls.get(url_key) or (None, None, 0.0)
+        content = self.contents.get(content_key) if content_key else None
+        if content is not None and time.monotonic() - fetched_at < self.fresh_for:
+            self.hits += 1
+            return content
+
+        async with self._semaphore:
+            try:
+                new_etag, body, charset, truncated = await self._download(
+                    url, etag if content is not None else None, max_bytes)
+            except Exception as e:
+                logger.warning(f"Error fetching attachment {url}: {str(e)}")
+                return content
+
+            if body is None:
+                self.revalidated += 1
+            else:
+                self.downloads += 1
+                content_key, content = await asyncio.to_thread(self._derived, kind, body, derive, charset, truncated)
+                if content is None:
+                    return None
+        self.urls.set(url_key, (new_etag, content_key, time.monotonic()))
+        return content
+
+    async def fetch_text(self, url: str) -> Optional[str]:
+        return await self._fetch(url, "text", MAX_BYTES, _decode_text)
+
+    async def fetch_image(self, url: str, max_side: int) -> Optional[str]:
+        """A downscaled data URL for an image; None leaves the original URL in place"""
+        if not PIL_AVAILABLE:
+            return None
+        return await self._fetch(url, f"image:{max_side}", IMAGE_MAX_BYTES,
+                                 functools.partial(_downscale_image, max_side=max_side))
+
+    async def prefetch(self, messages: List, image_max_side: Optional[int] = None) -> Dict[str, str]:
+        """
+        Fetch every text attachment, and every image when `image_max_side` is set,
+        concurrently; returns {url: text or image data URL}
+        """
+        jobs = {}
+        for message in messages:
+            for attachment in message.experimental_attachments or []:
+                if attachment.url in jobs:
+                    continue
+                if attachment.contentType.startswith("text"):
+                    jobs[attachment.url] = self.fetch_text(attachment.url)
+                elif attachment.contentType.startswith("image") and image_max_side:
+                    jobs[attachment.url] = self.fetch_image(attachment.url, image_max_side)
+        if not jobs:
+            return {}
+
+        contents = await asyncio.gather(*jobs.values())
+        return {url: content for url, content in zip(jobs, contents) if content is not None}
+
+    def stats(self) -> dict:
+        return {
+            "downloads": self.downloads,
+            "hits": self.hits,
+            "revalidated": self.revalidated,
+            "entries": len(self.contents),
+        }
+
+    async def close(self) -> None:
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+
+
+# Create a singleton instance
+attachment_fetcher = AttachmentFetcher()
@@ -0,0 +1,53 @@
+import asyncio
+import logging
+from typing import Dict
+
+logger = logging.getLogger(__name__)
+
+
+class BucketRegistry:
+    """
+    In-memory registry of storage buckets known to exist.
+    Buckets are provisioned once at startup, so uploads no longer list buckets per request;
+    a bucket missing from the registry is created on first use and remembered.
+    """
+
+    def __init__(self):
+        self.options: Dict[str, dict] = {}
+        self.known: set = set()
+        self._lock = asyncio.Lock()
+
+    def configure(self, buckets: Dict[str, dict]) -> None:
+        """Register the buckets the API writes to, with their creation options"""
+        self.options.update(buckets)
+
+    def _create(self, client, bucket_id: str) -> None:
+        logger.info(f"Creating {bucket_id} bucket...")
+        client.storage.create_bucket(bucket_id, self.options.get(bucket_id, {}))
+
+    async def provision(self, client) -> None:
+        """List buckets once and create any configured bucket that does not exist yet"""
+        try:
+            existing = {bucket.id for bucket in await asyncio.to_thread(client.storage.list_buckets)}
+            for bucket_id in self.options:
+                if bucket_id not in existing:
+                    await asyncio.to_thread(self._create, client, bucket_id)
+                self.known.add(bucket_id)
+        except Exception as e:
+            # Uploads fall back to creating their bucket on first use
+            logger.warning(f"Bucket provisioning failed: {str(e)}")
+
+    async def ensure(self, client, bucket_id: str) -> None:
+        if bucket_id in self.known:
+            return
+        async with self._lock:
+            if bucket_id in self.known:
+                return
+            existing = {bucket.id for bucket in await asyncio.to_thread(client.storage.list_buckets)}
+            if bucket_id not in existing:
+                await asyncio.to_thread(self._create, client, bucket_id)
+            self.known.add(bucket_id)
+
+
+# Create a singleton instance
+bucket_registry = BucketRegistry()
@@ -0,0 +1,125 @@
+import hashlib
+import json
+import logging
+import os
+from typing import List
+
+from litellm import token_counter
+
+from utils.cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+# Per-message framing overhead and flat cost of an image part, in tokens
+MESSAGE_OVERHEAD_TOKENS = 4
+IMAGE_TOKENS = 765
+TOOL_RESULT_MAX_TOKENS = int(os.getenv("CONTEXT_TOOL_RESULT_MAX_TOKENS", "2000"))
+
+
+class ContextWindow:
+    """
+    Fits chat history into a per-model token budget.
+    Token counts are cached by message hash, so each turn only counts its new messages.
+    """
+
+    def __init__(self, max_entries: int = None):
+        self.counts = LRUCache(max_entries or int(os.getenv("CONTEXT_COUNT_CACHE_MAX_ENTRIES", "20000")))
+        self.counted = 0
+        self.cached = 0
+        self.truncated = 0
+        self.dropped = 0
+
+    def _count_text(self, model: str, text: str) -> int:
+        try:
+            return token_counter(model=model, text=text)
+        except Exception:
+            return len(text) // 4
+
+    def count(self, message: dict, model: str) -> int:
+        """Token count of a single OpenAI-format message"""
+        key = hashlib.sha256(f"{model}:{json.dumps(message, sort_keys=True)}".encode()).hexdigest()
+        tokens = self.counts.get(key)
+        if tokens is not None:
+            self.cached += 1
+            return tokens
+
+        tokens = MESSAGE_OVERHEAD_TOKENS
+        content = message.get("content")
+        if isinstance(content, str):
+            tokens += self._count_text(model, content)
+        elif isinstance(content, list):
+            for part in content:
+                if part.get("type") == "text":
+                    tokens += self._count_text(model, part.get("text") or "")
+                elif part.get("type") == "image_url":
+                    tokens += IMAGE_TOKENS
+        if message.get("tool_calls"):
+            tokens += self._count_text(model, json.dumps(message["tool_calls"]))
+
+        self.counted += 1
+        self.counts.set(key, tokens)
+        return tokens
+
+    def _truncate_tool_result(self, message: dict, model: str) -> dict:
+        tokens = self.count(message, model)
+        if tokens <= TOOL_RESULT_MAX_TOKENS or not isinstance(message.get("content"), str):
+            return message
+
+        self.truncated += 1
+        keep_chars = TOOL_RESULT_MAX_TOKENS * 4
+        content = message["content"][:keep_chars] + f"... [truncated {tokens - TOOL_RESULT_MAX_TOKENS} tokens]"
+        return {**message, "content": content}
+
+    @staticmethod
+    def _group_turns(messages: List[dict]) -> List[List[dict]]:
+        """Group messages so tool results stay with the assistant message that called them"""
+        groups = []
+        for message in messages:
+            if message.get("role") == "tool" and groups:
+                groups[-1].append(message)
+            else:
+                groups.append([message])
+        return groups
+
+    def fit(self, messages: List[dict], config: dict) -> List[dict]:
+        """Drop the oldest turns and shorten old tool results until the history fits the model's budget"""
+        budget = config.get("context_budget")
+        if not budget or not messages:
+            return messages
+
+        model = config["model"]
+        system = [m for m in messages if m.get("role") == "system"]
+        groups = self._group_turns([m for m in messages if m.get("role") != "system"])
+
+        # Large tool results are only kept whole in the latest turn
+        for i, group in enumerate(groups[:-1]):
+            groups[i] = [self._truncate_tool_result(m, model) if m.get("role") == "tool" else m for m in group]
+
+        used = sum(self.count(m, model) for m in system)
+        kept = []
+        for group in reversed(groups):
+            tokens = sum(self.count(m, model) for m in group)
+            # The latest turn is always sent, even if it alone exceeds the budget
+            if kept and used + tokens > budget:
+                break
+            kept.append(group)
+            used += tokens
+
+        dropped = len(groups) - len(kept)
+        if dropped:
+            self.dropped += dropped
+            logger.info(f"Context window for {model}: dropped {dropped} oldest turns to fit {budget} tokens")
+
+        return system + [m for group in reversed(kept) for m in group]
+
+    def stats(self) -> dict:
+        return {
+            "counted": self.counted,
+            "cached": self.cached,
+            "truncated_tool_results": self.truncated,
+            "dropped_turns": self.dropped,
+        }
+
+
+# Create a singleton instance
+context_window = ContextWindow()
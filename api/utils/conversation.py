@@ -0,0 +1,104 @@
+import asyncio
+import json
+import logging
+import os
+from datetime import datetime
+from typing import Dict, List
+
+from db.queries import DatabaseQueries
+from db.write_queue import MessageWriteQueue
+from utils.prompt import ClientMessage
+from utils.redis import RedisClient
+
+logger = logging.getLogger(__name__)
+
+HISTORY_LIMIT = int(os.getenv("CONVERSATION_HISTORY_LIMIT", "500"))
+
+
+def message_fields(message: ClientMessage) -> dict:
+    """The stored form of a message, including attachments and tool invocations when it has them"""
+    return message.model_dump(exclude_none=True)
+
+
+def _stamp(value) -> datetime:
+    """A row's created_at as naive UTC, so queued stamps compare with stored ones"""
+    return datetime.fromisoformat(str(value)).replace(tzinfo=None)
+
+
+class ConversationStore:
+    """
+    Server-side chat history, so clients can send only the new message of a turn.
+    Reads go through Redis, which every worker and instance shares, then the `messages` table
+    plus the rows still waiting in the write queue.
+    There is deliberately no per-process copy: another instance may append a turn at any time.
+    """
+
+    def __init__(self, db: DatabaseQueries, redis: RedisClient, queue: MessageWriteQueue):
+        self.db = db
+        self.redis = redis
+        self.queue = queue
+        self.ttl = int(os.getenv("CONVERSATION_CACHE_TTL", "3600"))
+
+    @staticmethod
+    def _key(chat_id: str) -> str:
+        return f"chat:history:{chat_id}"
+
+    @staticmethod
+    def _from_row(row: dict) -> dict:
+        content = row.get("content")
+        if not isinstance(content, str):
+            content = json.dumps(content)
+        message = {"role": row["role"], "content": content}
+        if row.get("experimental_attachments"):
+            message["experimental_attachments"] = row["experimental_attachments"]
+        if row.get("tool_invocations"):
+            message["toolInvocations"] = row["tool_invocations"]
+        return message
+
+    def _store(self, chat_id: str, history: List[dict]) -> None:
+        self.redis.set(self._key(chat_id), {"messages": history[-HISTORY_LIMIT:]}, ttl=self.ttl)
+
+    def _load(self, chat_id: str, pending: List[Dict]) -> List[dict]:
+        cached = self.redis.get(self._key(chat_id))
+        if cached is not None:
+            return cached["messages"]
+
+        rows = self.db.get_latest_messages(chat_id, limit=HISTORY_LIMIT)
+        # Queued rows may have been written since they were taken; skip those the read returned
+        stored = {_stamp(row["created_at"]) for row in rows if row.get("created_at")}
+        rows += [row for row in pending if _stamp(row["created_at"]) not in stored]
+        history = [self._from_row(row) for row in rows][-HISTORY_LIMIT:]
+
+        # Only cache what the table holds in full; queued rows may still be dropped
+        if not pending and chat_id not in self.queue.dropped_chats:
+            self._store(chat_id, history)
+        return history
+
+    async def load(self, chat_id: str) -> List[ClientMessage]:
+        """Rebuild the latest HISTORY_LIMIT messages of a chat"""
+        # Taken before the table is read, so rows written in between are not missed
+        pending = self.queue.pending(chat_id)
+        history = await asyncio.to_thread(self._load, chat_id, pending)
+        return [ClientMessage(**message) for message in history]
+
+    async def append(self, chat_id: str, messages: List[ClientMessage]) -> None:
+        """Add the rows of a completed turn to the cached history, if it is cached"""
+        def _append():
+            # Without a cached copy the next load rebuilds the history, queued rows included
+            cached = self.redis.get(self._key(chat_id))
+            if cached is None:
+                return
+            history = cached["messages"] + [message_fields(m) for m in messages]
+            self._store(chat_id, history)
+
+        try:
+            await asyncio.to_thread(_append)
+        except Exception as e:
+            # A stale cache only costs a reload from the database
+            logger.error(f"Error caching conversation {chat_id}: {str(e)}")
+            self.redis.delete(self._key(chat_id))
+
+    async def replace(self, chat_id: str, messages: List[ClientMessage]) -> None:
+        """Seed the cache from a full history sent by the client"""
+        history = [message_fields(m) for m in messages]
+        await asyncio.to_thread(self._store, chat_id, history)
@@ -0,0 +1,141 @@
+import asyncio
+import logging
+import os
+from collections import defaultdict
+from typing import Any, AsyncIterator, Awaitable, Callable, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+HEDGE_DEADLINE = float(os.getenv("HEDGE_DEADLINE", "3"))
+
+StreamOpener = Callable[[], Awaitable[Any]]
+
+
+class HedgeUnavailable(Exception):
+    """Raised by a hedge candidate's opener when it cannot start, e.g. no admission slot is free"""
+
+
+def _has_output(chunk) -> bool:
+    for choice in getattr(chunk, "choices", None) or []:
+        if choice.finish_reason or choice.delta.content or choice.delta.tool_calls:
+            return True
+    return False
+
+
+async def _close(stream) -> None:
+    try:
+        await stream.aclose()
+    except Exception as e:
+        logger.debug(f"Error closing provider stream: {str(e)}")
+
+
+async def _first_output(open_stream: StreamOpener) -> Tuple[Any, List[Any]]:
+    """Open a provider stream and read it up to its first content, tool call or finish chunk"""
+    stream = await open_stream()
+    buffered = []
+    try:
+        async for chunk in stream:
+            buffered.append(chunk)
+            if _has_output(chunk):
+                break
+    except BaseException:
+        await _close(stream)
+        raise
+    return stream, buffered
+
+
+async def _replay(stream, buffered: List[Any]) -> AsyncIterator[Any]:
+    try:
+        for chunk in buffered:
+            yield chunk
+        async for chunk in stream:
+            yield chunk
+    finally:
+        await _close(stream)
+
+
+class Hedger:
+    """
+    Races provider streams for the first token.
+    The primary candidate starts immediately; each further candidate starts only if
+    nothing has produced output within `deadline` seconds. The first stream to produce
+    output wins and the others are cancelled and closed.
+    """
+
+    def __init__(self):
+        self.requests = 0
+        self.hedged = 0
+        self.skipped = 0
+        self.wins = defaultdict(int)
+
+    async def open(self, candidates: List[Tuple[str, StreamOpener]], deadline: float) -> Tuple[str, AsyncIterator[Any]]:
+        """Return (winning model id, chunk iterator)"""
+        self.requests += 1
+        tasks = {}
+        pending = set()
+        last_error = None
+        winner = None
+
+        try:
+            for index, (model_id, open_stream) in enumerate(candidates):
+                if index > 0:
+                    self.hedged += 1
+                    logger.info(f"No first token from earlier candidates within {deadline}s, hedging to {model_id}")
+                task = asyncio.create_task(_first_output(open_stream))
+                tasks[task] = model_id
+                pending.add(task)
+
+                is_last = index == len(candidates) - 1
+                while pending:
+                    done, pending = await asyncio.wait(
+                        pending,
+                        timeout=None if is_last else deadline,
+                        return_when=asyncio.FIRST_COMPLETED,
+                    )
+                    if not done:
+                        break  # Deadline passed, start the next candidate
+                    for task in done:
+                        if task.exception() is None:
+                            winner = task
+                            break
+                        if isinstance(task.exception(), HedgeUnavailable):
+                            # Not a provider failure; keep waiting on the earlier candidates
+                            self.skipped += 1
+                            logger.info(f"Hedge to {tasks[task]} skipped: {str(task.exception())}")
+                            continue
+                        last_error = task.exception()
+                        logger.warning(f"Provider stream for {tasks[task]} failed: {str(last_error)}")
+                    if winner:
+                        break
+                if winner:
+                    break
+        finally:
+            for task in tasks:
+                if task is winner:
+                    continue
+                if task.done():
+                    if not task.cancelled() and task.exception() is None:
+                        await _close(task.result()[0])
+                else:
+                    task.cancel()
+
+        if winner is None:
+            raise last_error or RuntimeError("No provider stream produced output")
+
+        model_id = tasks[winner]
+        self.wins[model_id] += 1
+        stream, buffered = winner.result()
+        return model_id, _replay(stream, buffered)
+
+    def stats(self) -> dict:
+        return {
+            "requests": self.requests,
+            "hedged": self.hedged,
+            "hedge_rate": self.hedged / self.requests if self.requests else 0.0,
+            "skipped": self.skipped,
+            "wins": dict(self.wins),
+        }
+
+
+# Create a singleton instance
+hedger = Hedger()
@@ -0,0 +1,109 @@
+import io
+import logging
+import os
+from typing import Optional
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+try:
+    import pyarrow.parquet as pq
+    PARQUET_AVAILABLE = True
+except ImportError:
+    PARQUET_AVAILABLE = False
+
+COLUMNAR_SUFFIX = ".parquet"
+# Well below the 50 MB bucket limit: a parsed DataFrame is several times the size of its file
+MAX_BYTES = int(os.getenv("INGEST_MAX_BYTES", str(20 * 1024 * 1024)))
+# String columns with at most this share of distinct values are stored as categories
+CATEGORY_RATIO = float(os.getenv("INGEST_CATEGORY_RATIO", "0.5"))
+
+
+class ColumnarCopy:
+    """Parquet encoding of an uploaded spreadsheet with its shape and column types"""
+
+    def __init__(self, data: bytes, rows: int, columns: int, dtypes: dict):
+        self.data = data
+        self.rows = rows
+        self.columns = columns
+        self.dtypes = dtypes
+
+    @property
+    def dimensions(self) -> dict:
+        return {"rows": self.rows, "columns": self.columns}
+
+
+def columnar_path(path: str) -> str:
+    """Storage path of the columnar copy, next to the original"""
+    return path + COLUMNAR_SUFFIX
+
+
+def columnar_head(copy: ColumnarCopy, rows: int) -> pd.DataFrame:
+    """The first rows of a columnar copy, decoding only the leading batch"""
+    batch = next(pq.ParquetFile(io.BytesIO(copy.data)).iter_batches(batch_size=rows), None)
+    return batch.to_pandas() if batch is not None else pd.DataFrame(columns=list(copy.dtypes))
+
+
+def reader_for(filename: str, content_type: str):
+    """The pandas reader for a CSV, XLSX or JSON upload, or None"""
+    name = filename.lower()
+    if name.endswith(".csv") or "csv" in content_type:
+        return pd.read_csv
+    if name.endswith((".xlsx", ".xls")) or "spreadsheet" in content_type or "ms-excel" in content_type:
+        return pd.read_excel
+    if name.endswith(".json") or content_type == "application/json":
+        return pd.read_json
+    return None
+
+
+def downcast(df: pd.DataFrame) -> pd.DataFrame:
+    """Narrow numeric columns to the smallest lossless type and low-cardinality strings to categories"""
+    for column in df.columns:
+        series = df[column]
+        if pd.api.types.is_bool_dtype(series):
+            continue
+        if pd.api.types.is_integer_dtype(series):
+            # Always signed: unsigned columns wrap around on subtraction for every later reader
+            df[column] = pd.to_numeric(series, downcast="integer")
+        elif pd.api.types.is_float_dtype(series):
+            narrowed = series.astype("float32")
+            if ((narrowed.astype(series.dtype) == series) | series.isna()).all():
+                df[column] = narrowed
+        elif pd.api.types.is_string_dtype(series) and len(series):
+            if series.nunique(dropna=True) <= len(series) * CATEGORY_RATIO:
+                df[column] = series.astype("category")
+    return df
+
+
+def to_columnar(file, filename: str, content_type: str) -> Optional[ColumnarCopy]:
+    """
+    Parse a CSV, XLSX or JSON upload once and encode it as Parquet.
+    Blocking; run it in a worker thread. Returns None for other formats or unreadable files.
+    """
+    reader = reader_for(filename, content_type)
+    if reader is None or not PARQUET_AVAILABLE:
+        return None
+
+    file.seek(0, os.SEEK_END)
+    if file.tell() > MAX_BYTES:
+        logger.info(f"Skipping columnar conversion of {filename}: larger than {MAX_BYTES} bytes")
+        return None
+    file.seek(0)
+
+    try:
+        df = downcast(reader(file))
+        output = io.BytesIO()
+        df.to_parquet(output, index=False, compression="zstd")
+    except Exception as e:
+        logger.warning(f"Columnar conversion of {filename} failed: {str(e)}")
+        return None
+    finally:
+        file.seek(0)
+
+    return ColumnarCopy(
+        data=output.getvalue(),
+        rows=len(df),
+        columns=len(df.columns),
+        dtypes={str(column): str(dtype) for column, dtype in df.dtypes.items()},
+    )
@@ -0,0 +1,148 @@
+import logging
+import os
+import random
+import time
+from collections import deque
+from typing import Deque, Dict, Iterable, Optional
+
+from fastapi import HTTPException, status
+
+logger = logging.getLogger(__name__)
+
+AUTO_MODEL_ID = "auto"
+
+EWMA_ALPHA = float(os.getenv("ROUTER_EWMA_ALPHA", "0.2"))
+MAX_ERROR_RATE = float(os.getenv("ROUTER_MAX_ERROR_RATE", "0.25"))
+EXPLORE_RATE = float(os.getenv("ROUTER_EXPLORE_RATE", "0.05"))
+EXPECTED_TOKENS = int(os.getenv("ROUTER_EXPECTED_TOKENS", "300"))
+# Error rates decay with time since the last error, so an excluded model becomes eligible again
+ERROR_HALF_LIFE = float(os.getenv("ROUTER_ERROR_HALF_LIFE", "60"))
+# Assumed until a model has served real traffic
+PRIOR_TTFT = 1.0
+PRIOR_TOKENS_PER_SECOND = 50.0
+
+
+def _ewma(current: Optional[float], sample: float) -> float:
+    return sample if current is None else EWMA_ALPHA * sample + (1 - EWMA_ALPHA) * current
+
+
+class ModelHealth:
+    """Exponentially weighted latency, throughput and error rate of one model"""
+
+    def __init__(self):
+        self.ttft: Optional[float] = None
+        self.tokens_per_second: Optional[float] = None
+        self.error_rate = 0.0
+        self.samples = 0
+        self.last_error_at: Optional[float] = None
+        self.error_rate_at: Optional[float] = None
+
+    @property
+    def current_error_rate(self) -> float:
+        """The error rate, halved for every ERROR_HALF_LIFE seconds without new samples"""
+        if self.error_rate_at is None:
+            return self.error_rate
+        return self.error_rate * 0.5 ** ((time.time() - self.error_rate_at) / ERROR_HALF_LIFE)
+
+    def observe(self, ttft: Optional[float], tokens_per_second: Optional[float], failed: bool) -> None:
+        self.samples += 1
+        self.error_rate = _ewma(self.current_error_rate, 1.0 if failed else 0.0)
+        self.error_rate_at = time.time()
+        if failed:
+            self.last_error_at = time.time()
+        if ttft is not None:
+            self.ttft = _ewma(self.ttft, ttft)
+        if tokens_per_second is not None:
+            self.tokens_per_second = _ewma(self.tokens_per_second, tokens_per_second)
+
+    @property
+    def expected_latency(self) -> float:
+        """Seconds to first token plus a typical answer at the observed throughput"""
+        ttft = self.ttft if self.ttft is not None else PRIOR_TTFT
+        tokens_per_second = self.tokens_per_second or PRIOR_TOKENS_PER_SECOND
+        return ttft + EXPECTED_TOKENS / tokens_per_second
+
+    @property
+    def healthy(self) -> bool:
+        return self.current_error_rate < MAX_ERROR_RATE
+
+    def to_dict(self) -> dict:
+        return {
+            "ttft": self.ttft,
+            "tokens_per_second": self.tokens_per_second,
+            "error_rate": self.current_error_rate,
+            "expected_latency": self.expected_latency,
+            "healthy": self.healthy,
+            "samples": self.samples,
+            "last_error_at": self.last_error_at,
+        }
+
+
+class ModelRouter:
+    """
+    Routes `auto` requests to the fastest healthy model that has the required capabilities.
+    Stream telemetry feeds each model's EWMA time to first token, throughput and error rate;
+    the error rate decays while a model is excluded, so a short provider outage is not permanent.
+    Only models with `auto_route` and an API key are candidates; a small share of requests
+    goes to a random healthy candidate so stats of slower models stay current.
+    """
+
+    def __init__(self):
+        self.models: Dict[str, ModelHealth] = {}
+        self.decisions: Deque[dict] = deque(maxlen=100)
+        self.routed: Dict[str, int] = {}
+
+    def health(self, model_id: str) -> ModelHealth:
+        if model_id not in self.models:
+            self.models[model_id] = ModelHealth()
+        return self.models[model_id]
+
+    def observe(self, model_id: str, ttft: Optional[float], tokens_per_second: Optional[float],
+                failed: bool) -> None:
+        self.health(model_id).observe(ttft, tokens_per_second, failed)
+
+    def choose(self, model_configs: Dict[str, dict], required: Iterable[str] = ()) -> str:
+        """Pick a model id for an `auto` request"""
+        required = set(required)
+        eligible = [
+            model_id for model_id, config in model_configs.items()
+            if config.get("auto_route") and config.get("api_key")
+            and required <= set(config.get("capabilities", []))
+        ]
+        if not eligible:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"No model available for auto routing with capabilities: {sorted(required)}"
+            )
+
+        # With every candidate failing, fall back to the least broken one rather than refusing
+        healthy = [model_id for model_id in eligible if self.health(model_id).healthy]
+        if not healthy:
+            healthy = [min(eligible, key=lambda model_id: self.health(model_id).current_error_rate)]
+
+        if len(healthy) > 1 and random.random() < EXPLORE_RATE:
+            chosen, reason = random.choice(healthy), "explore"
+        else:
+            chosen, reason = min(healthy, key=lambda model_id: self.health(model_id).expected_latency), "fastest"
+
+        self.routed[chosen] = self.routed.get(chosen, 0) + 1
+        self.decisions.append({
+            "at": time.time(),
+            "model": chosen,
+            "reason": reason,
+            "required": sorted(required),
+            "candidates": {model_id: round(self.health(model_id).expected_latency, 3) for model_id in healthy},
+        })
+        logger.debug(f"Auto-routed to {chosen} ({reason})")
+        return chosen
+
+    def stats(self) -> dict:
+        return {
+            "models": {model_id: health.to_dict() for model_id, health in self.models.items()},
+            "routed": dict(self.routed),
+            "recent_decisions": list(self.decisions),
+        }
+
+
+# Create a singleton instance
+model_router = ModelRouter()
@@ -0,0 +1,313 @@
+import asyncio
+import io
+import logging
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
+
+import httpx
+import pandas as pd
+from fastapi import UploadFile
+
+from client import supabase
+from utils.ingest import MAX_BYTES as INGEST_MAX_BYTES
+from utils.ingest import ColumnarCopy, columnar_head, columnar_path, reader_for, to_columnar
+from utils.storage_upload import storage_uploader
+
+logger = logging.getLogger(__name__)
+
+try:
+    from PIL import Image, ImageOps
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+
+try:
+    import pypdfium2 as pdfium
+    PDFIUM_AVAILABLE = PIL_AVAILABLE
+except ImportError:
+    PDFIUM_AVAILABLE = False
+
+THUMBNAIL_SUFFIX = ".thumb.webp"
+THUMBNAIL_SIZE = int(os.getenv("PREVIEW_THUMBNAIL_SIZE", "320"))
+THUMBNAIL_QUALITY = int(os.getenv("PREVIEW_THUMBNAIL_QUALITY", "80"))
+SNIPPET_ROWS = int(os.getenv("PREVIEW_SNIPPET_ROWS", "20"))
+MAX_BYTES = int(os.getenv("PREVIEW_MAX_BYTES", str(20 * 1024 * 1024)))
+# Spreadsheets are spooled to disk while downloading, so they may be as large as the bucket allows
+SPREADSHEET_MAX_BYTES = int(os.getenv("PREVIEW_SPREADSHEET_MAX_BYTES", str(50 * 1024 * 1024)))
+SPOOL_MAX_MEMORY = 1024 * 1024
+# How long shutdown waits for queued previews before marking them failed
+DRAIN_TIMEOUT = float(os.getenv("PREVIEW_DRAIN_TIMEOUT", "10"))
+
+
+def thumbnail_path(path: str) -> str:
+    """Storage path of an upload's thumbnail, next to the original"""
+    return path + THUMBNAIL_SUFFIX
+
+
+def preview_kind(content_type: str, filename: str, is_spreadsheet: bool) -> Optional[str]:
+    """The preview that can be rendered for an upload here, or None"""
+    if content_type.startswith("image/") and PIL_AVAILABLE:
+        return "image"
+    if content_type == "application/pdf" and PDFIUM_AVAILABLE:
+        return "pdf"
+    if is_spreadsheet and reader_for(filename, content_type):
+        return "spreadsheet"
+    return None
+
+
+def _encode_thumbnail(image) -> bytes:
+    image.thumbnail((THUMBNAIL_SIZE, THUMBNAIL_SIZE), Image.LANCZOS)
+    if image.mode not in ("RGB", "RGBA"):
+        image = image.convert("RGBA" if "transparency" in image.info or image.mode in ("LA", "PA") else "RGB")
+    output = io.BytesIO()
+    image.save(output, format="WEBP", quality=THUMBNAIL_QUALITY, method=4)
+    return output.getvalue()
+
+
+def render_image(data: bytes) -> bytes:
+    image = Image.open(io.BytesIO(data))
+    # Decode at a reduced scale where the format supports it (JPEG), instead of full resolution
+    image.draft("RGB", (THUMBNAIL_SIZE, THUMBNAIL_SIZE))
+    return _encode_thumbnail(ImageOps.exif_transpose(image))
+
+
+def render_pdf(data: bytes) -> bytes:
+    """First page of a PDF rendered at thumbnail resolution"""
+    pdf = pdfium.PdfDocument(data)
+    try:
+        page = pdf[0]
+        scale = THUMBNAIL_SIZE / max(page.get_size())
+        return _encode_thumbnail(page.render(scale=scale).to_pil())
+    finally:
+        pdf.close()
+
+
+def render_snippet(file, filename: str, content_type: str, columnar: Optional[ColumnarCopy] = None) -> Optional[dict]:
+    """
+    First rows of a spreadsheet as {headers, rows}, the shape the file preview component renders.
+    JSON cannot be read partially, so its rows come from the columnar copy; without one, only files
+    small enough to convert are parsed, and larger ones get no snippet (None).
+    """
+    reader = reader_for(filename, content_type)
+    if reader is pd.read_json:
+        if columnar is not None:
+            df = columnar_head(columnar, SNIPPET_ROWS)
+        else:
+            file.seek(0, os.SEEK_END)
+            if file.tell() > INGEST_MAX_BYTES:
+                return None
+            file.seek(0)
+            df = reader(file)
+    else:
+        file.seek(0)
+        df = reader(file, nrows=SNIPPET_ROWS)
+    head = df.head(SNIPPET_ROWS)
+    return {
+        "headers": [str(column) for column in head.columns],
+        "rows": [["" if pd.isna(value) else str(value) for value in row] for row in head.itertuples(index=False)],
+    }
+
+
+def render_spreadsheet(file, filename: str, content_type: str) -> Tuple[Optional[ColumnarCopy], Optional[dict]]:
+    """The columnar copy of a spreadsheet, if it can be converted, and a snippet of its first rows"""
+    columnar = to_columnar(file, filename, content_type)
+    return columnar, render_snippet(file, filename, content_type, columnar)
+
+
+class PreviewWorker:
+    """
+    Renders upload previews on a background worker pool, off the request path.
+    Images get small WebP thumbnails and PDFs a render of their first page (needs pypdfium2).
+    Spreadsheets are converted to a columnar copy stored next to the original (see utils.ingest)
+    and get a snippet of their first rows. Each result is merged into the upload's `preview_data`.
+    """
+
+    def __init__(self, workers: int = None, max_queue: int = None):
+        self.workers = workers or int(os.getenv("PREVIEW_WORKERS", "2"))
+        self.queue: asyncio.Queue = asyncio.Queue(max_queue or int(os.getenv("PREVIEW_QUEUE_SIZE", "256")))
+        self.pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="preview")
+        self._tasks: List[asyncio.Task] = []
+        self._interrupted: List[dict] = []
+        self._http: Optional[httpx.AsyncClient] = None
+
+        self.enqueued = 0
+        self.rendered = 0
+        self.failed = 0
+        self.dropped = 0
+
+    @property
+    def http(self) -> httpx.AsyncClient:
+        if self._http is None:
+            self._http = httpx.AsyncClient(timeout=httpx.Timeout(30.0, connect=10.0))
+        return self._http
+
+    def submit(self, job: dict) -> bool:
+        """
+        Queue a preview job; returns False if the queue is full, and the caller should `fail` it.
+        A job names the upload row (user_id, chat_id, storage_path), its `kind`, the stored object
+        (object_bucket, object_path, `url`) that derived files are written next to, `filename`,
+        `content_type` and the `preview` it was inserted with.
+        """
+        if not self._tasks:
+            # Not started by the lifespan hook; start the workers on first use
+            self._start_workers()
+        try:
+            self.queue.put_nowait(job)
+        except asyncio.QueueFull:
+            self.dropped += 1
+            logger.warning(f"Preview queue full, skipping preview of {job['storage_path']}")
+            return False
+        self.enqueued += 1
+        return True
+
+    def _start_workers(self) -> None:
+        self._tasks = [asyncio.create_task(self._run()) for _ in range(self.workers)]
+
+    async def start(self) -> None:
+        if not self._tasks:
+            self._start_workers()
+            logger.info(f"Preview worker pool started with {self.workers} workers")
+
+    async def stop(self) -> None:
+        """Wait up to DRAIN_TIMEOUT for queued previews, then mark the ones left over as failed"""
+        if self._tasks:
+            try:
+                await asyncio.wait_for(self.queue.join(), DRAIN_TIMEOUT)
+            except asyncio.TimeoutError:
+                pass
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+        unfinished = self._interrupted
+        self._interrupted = []
+        while not self.queue.empty():
+            unfinished.append(self.queue.get_nowait())
+            self.queue.task_done()
+        for job in unfinished:
+            self.failed += 1
+            await self.fail(job)
+        if unfinished:
+            logger.info(f"Preview worker pool stopped, {len(unfinished)} previews not rendered")
+
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+    async def _run(self) -> None:
+        while True:
+            job = await self.queue.get()
+            try:
+                await self._process(job)
+                self.rendered += 1
+            except asyncio.CancelledError:
+                # Stopped mid-render; stop() records the failure
+                self._interrupted.append(job)
+                raise
+            except Exception as e:
+                self.failed += 1
+                logger.warning(f"Preview of {job['storage_path']} failed: {str(e)}")
+                await self.fail(job)
+            finally:
+                self.queue.task_done()
+
+    async def _download(self, url: str) -> bytes:
+        body = bytearray()
+        async with self.http.stream("GET", url) as response:
+            response.raise_for_status()
+            async for chunk in response.aiter_bytes():
+                body.extend(chunk)
+                if len(body) > MAX_BYTES:
+                    raise ValueError(f"larger than {MAX_BYTES} bytes")
+        return bytes(body)
+
+    async def _download_file(self, url: str, max_bytes: int):
+        """Download into a temporary file that spills to disk, so large spreadsheets are not held in memory"""
+        file = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_MEMORY)
+        try:
+            size = 0
+            async with self.http.stream("GET", url) as response:
+                response.raise_for_status()
+                async for chunk in response.aiter_bytes():
+                    size += len(chunk)
+                    if size > max_bytes:
+                        raise ValueError(f"larger than {max_bytes} bytes")
+                    file.write(chunk)
+            file.seek(0)
+            return file
+        except BaseException:
+            file.close()
+            raise
+
+    async def _store(self, job: dict, path: str, data: bytes, content_type: str) -> str:
+        """Store a derived file next to the job's object and return its public URL"""
+        upload = UploadFile(file=io.BytesIO(data), size=len(data), filename=path)
+        await storage_uploader.upload(job["object_bucket"], path, upload, content_type, upsert=True)
+        return supabase.storage.from_(job["object_bucket"]).get_public_url(path)
+
+    async def _process(self, job: dict) -> None:
+        loop = asyncio.get_running_loop()
+        kind = job["kind"]
+
+        if kind == "spreadsheet":
+            file = await self._download_file(job["url"], SPREADSHEET_MAX_BYTES)
+            try:
+                columnar, snippet = await loop.run_in_executor(
+                    self.pool, render_spreadsheet, file, job["filename"], job["content_type"])
+            finally:
+                file.close()
+
+            updates = {"previewStatus": "ready"}
+            if snippet is not None:
+                updates["snippet"] = snippet
+            if columnar:
+                path = columnar_path(job["object_path"])
+                updates["columnar"] = await self._store(job, path, columnar.data, "application/vnd.apache.parquet")
+                updates["dimensions"] = columnar.dimensions
+            await self._update(job, updates)
+            return
+
+        data = await self._download(job["url"])
+        render = render_pdf if kind == "pdf" else render_image
+        thumbnail = await loop.run_in_executor(self.pool, render, data)
+
+        url = await self._store(job, thumbnail_path(job["object_path"]), thumbnail, "image/webp")
+        await self._update(job, {"thumbnail": url, "previewStatus": "ready"})
+
+    async def fail(self, job: dict) -> None:
+        """Mark a job's preview as failed, so its row does not stay pending"""
+        # Images keep the previous behaviour of previewing the original
+        updates = {"previewStatus": "failed"}
+        if job["kind"] == "image":
+            updates["thumbnail"] = job["url"]
+        try:
+            await self._update(job, updates)
+        except Exception as e:
+            logger.error(f"Failed to record preview failure of {job['storage_path']}: {str(e)}")
+
+    async def _update(self, job: dict, updates: dict) -> None:
+        job["preview"] = {**job["preview"], **updates}
+        query = supabase.table('file_uploads').update({"preview_data": job["preview"]}) \
+            .eq('user_id', job["user_id"]) \
+            .eq('chat_id', job["chat_id"]) \
+            .eq('storage_path', job["storage_path"])
+        # Not on the render pool: the update must still go through while renders are stuck or cancelled
+        await asyncio.to_thread(query.execute)
+
+    def stats(self) -> dict:
+        return {
+            "depth": self.queue.qsize(),
+            "workers": len(self._tasks),
+            "enqueued": self.enqueued,
+            "rendered": self.rendered,
+            "failed": self.failed,
+            "dropped": self.dropped,
+        }
+
+
+# Create a singleton instance
+preview_worker = PreviewWorker()
@@ -1,6 +1,6 @@
 import json
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import Dict, List, Optional
 from .types import ClientAttachment, ToolInvocation
 
 
@@ -11,8 +11,10 @@ class ClientMessage(BaseModel):
     toolInvocations: Optional[List[ToolInvocation]] = None
 
 
-def convert_to_openai_messages(messages: List[ClientMessage]):
+def convert_to_openai_messages(messages: List[ClientMessage], attachments: Optional[Dict[str, str]] = None):
+    """`attachments` maps attachment URLs to prefetched text or downscaled image data URLs"""
     openai_messages = []
+    attachments = attachments or {}
 
     for message in messages:
         parts = []
@@ -28,14 +30,15 @@ def convert_to_openai_messages(messages: List[ClientMessage]):
                     parts.append({
                         'type': 'image_url',
                         'image_url': {
-                            'url': attachment.url
+                            'url': attachments.get(attachment.url, attachment.url)
                         }
                     })
 
                 elif (attachment.contentType.startswith('text')):
+                    text = attachments.get(attachment.url)
                     parts.append({
                         'type': 'text',
-                        'text': attachment.url
+                        'text': f"{attachment.name}:\n{text}" if text is not None else attachment.url
                     })
 
         if (message.toolInvocations):
@@ -0,0 +1,85 @@
+import asyncio
+import logging
+import os
+from typing import Dict, Optional
+
+import httpx
+import litellm
+
+logger = logging.getLogger(__name__)
+
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+# Default endpoints for warming connections; a model config's api_base takes precedence
+PROVIDER_BASE_URLS = {
+    "openai": "https://api.openai.com/v1",
+    "deepseek": "https://api.deepseek.com",
+}
+
+
+class ProviderClients:
+    """
+    Shared keep-alive HTTP connection pool for LLM providers.
+    The pool is installed as litellm's async client session, so every OpenAI-compatible
+    provider reuses warm connections instead of paying TCP and TLS handshakes per request.
+    """
+
+    def __init__(self, verify: bool = True):
+        self.verify = verify
+        self.http: Optional[httpx.AsyncClient] = None
+
+    def _build_client(self) -> httpx.AsyncClient:
+        return httpx.AsyncClient(
+            http2=HTTP2_AVAILABLE,
+            verify=self.verify,
+            limits=httpx.Limits(
+                max_connections=int(os.getenv("PROVIDER_MAX_CONNECTIONS", "200")),
+                max_keepalive_connections=int(os.getenv("PROVIDER_MAX_KEEPALIVE", "50")),
+                keepalive_expiry=float(os.getenv("PROVIDER_KEEPALIVE_EXPIRY", "120")),
+            ),
+            timeout=httpx.Timeout(600.0, connect=10.0),
+            follow_redirects=True,
+        )
+
+    @staticmethod
+    def base_urls(model_configs: Dict[str, dict]) -> set:
+        urls = set()
+        for config in model_configs.values():
+            url = config.get("api_base") or PROVIDER_BASE_URLS.get(config.get("provider"))
+            if url and config.get("api_key"):
+                urls.add(url.rstrip("/"))
+        return urls
+
+    async def start(self, model_configs: Dict[str, dict]) -> None:
+        """Create the pool and open a connection to each configured provider"""
+        if self.http is None:
+            self.http = self._build_client()
+            litellm.aclient_session = self.http
+        await self.warm(model_configs)
+
+    async def warm(self, model_configs: Dict[str, dict]) -> None:
+        async def touch(url: str):
+            try:
+                # Any response will do; the point is an established, pooled connection
+                await self.http.head(url, timeout=5.0)
+            except Exception as e:
+                logger.warning(f"Could not pre-warm connection to {url}: {str(e)}")
+
+        urls = self.base_urls(model_configs)
+        await asyncio.gather(*(touch(url) for url in urls))
+        logger.info(f"Provider connection pool warmed for {len(urls)} endpoints (http2={HTTP2_AVAILABLE})")
+
+    async def close(self) -> None:
+        if self.http is not None:
+            if litellm.aclient_session is self.http:
+                litellm.aclient_session = None
+            await self.http.aclose()
+            self.http = None
+
+
+# Create a singleton instance
+provider_clients = ProviderClients()
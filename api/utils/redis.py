@@ -1,5 +1,6 @@
 import os
 import redis
+import redis.asyncio
 from typing import Optional
 from dotenv import load_dotenv
 import json
@@ -21,13 +22,17 @@ class RedisClient:
         try:
             if self.redis_url:
                 self.client = redis.from_url(self.redis_url)
+                # Async client for work on the event loop, such as tailing streams
+                self.async_client = redis.asyncio.from_url(self.redis_url)
                 logger.info("Redis client initialized successfully")
             else:
                 logger.warning("REDIS_URL not provided. Redis client not initialized.")
                 self.client = None
+                self.async_client = None
         except Exception as e:
             logger.error(f"Failed to initialize Redis client: {str(e)}")
             self.client = None
+            self.async_client = None
     
     def get(self, key: str) -> Optional[dict]:
         """Get a value from Redis cache"""
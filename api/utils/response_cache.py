@@ -0,0 +1,61 @@
+import hashlib
+import json
+import os
+from typing import List, Optional
+
+from utils.cache import LRUCache
+from utils.stream import TextDelta, Finish, StreamEvent
+
+
+class ResponseCache:
+    """
+    Exact-match cache of completed answers, keyed by model, prompt and tool schema.
+    Only plain text answers are stored; turns that called tools are never cached.
+    """
+
+    def __init__(self, max_entries: int = None, max_chars: int = None, ttl: int = None):
+        self.entries = LRUCache(max_entries or int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "512")))
+        self.max_chars = max_chars or int(os.getenv("RESPONSE_CACHE_MAX_CHARS", "32000"))
+        self.ttl = ttl or int(os.getenv("RESPONSE_CACHE_TTL", "3600"))
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(model_id: str, messages: List[dict], tools_digest: Optional[str]) -> str:
+        normalized = json.dumps(
+            {"model": model_id, "messages": messages, "tools": tools_digest},
+            sort_keys=True,
+            separators=(",", ":"),
+            ensure_ascii=False,
+        )
+        return hashlib.sha256(normalized.encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[List[StreamEvent]]:
+        """Return the events to replay for a cached answer, or None"""
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        text, prompt_tokens, completion_tokens = entry
+        return [TextDelta(text), Finish("stop", prompt_tokens, completion_tokens)]
+
+    def set(self, key: str, text: str, prompt_tokens: int, completion_tokens: int) -> None:
+        if not text or len(text) > self.max_chars:
+            return
+        self.entries.set(key, (text, prompt_tokens, completion_tokens), ttl=self.ttl)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": len(self.entries),
+            "evictions": self.entries.evictions,
+        }
+
+
+# Create a singleton instance
+response_cache = ResponseCache()
@@ -0,0 +1,163 @@
+import asyncio
+import base64
+import hashlib
+import logging
+import os
+from typing import AsyncIterator, Optional
+from urllib.parse import quote
+
+import httpx
+from fastapi import UploadFile
+
+logger = logging.getLogger(__name__)
+
+# Supabase's resumable endpoint requires every chunk except the last to be exactly 6 MB
+CHUNK_SIZE = 6 * 1024 * 1024
+MAX_RETRIES = int(os.getenv("UPLOAD_MAX_RETRIES", "3"))
+TUS_VERSION = "1.0.0"
+READ_BLOCK = 256 * 1024
+HASH_BLOCK = 1024 * 1024
+
+
+def _tus_metadata(**values: str) -> str:
+    return ",".join(f"{key} {base64.b64encode(value.encode()).decode()}" for key, value in values.items())
+
+
+class StorageUploader:
+    """
+    Streams uploads to Supabase Storage without holding whole files in memory.
+    Files that fit in one chunk go through the standard object endpoint; larger ones use
+    a TUS resumable session and are sent in CHUNK_SIZE pieces. A failed chunk is retried
+    from the offset the server confirms. Bodies are read from the spooled upload in small
+    blocks as they are sent, so memory per upload stays constant whatever the file size.
+    """
+
+    def __init__(self, url: str = None, key: str = None, chunk_size: int = CHUNK_SIZE):
+        self.url = (url or os.getenv("NEXT_PUBLIC_SUPABASE_URL") or "").rstrip("/")
+        self.key = key or os.getenv("NEXT_PUBLIC_SUPABASE_ANON_KEY")
+        self.chunk_size = chunk_size
+        self._http: Optional[httpx.AsyncClient] = None
+
+    @property
+    def http(self) -> httpx.AsyncClient:
+        if self._http is None:
+            self._http = httpx.AsyncClient(timeout=httpx.Timeout(60.0, connect=10.0))
+        return self._http
+
+    def _headers(self, access_token: Optional[str]) -> dict:
+        return {"apikey": self.key, "Authorization": f"Bearer {access_token or self.key}"}
+
+    @staticmethod
+    async def _body(file: UploadFile, offset: int, length: int) -> AsyncIterator[bytes]:
+        """Stream `length` bytes of the file from `offset` in small blocks, read off the event loop"""
+        def read(position: int, size: int) -> bytes:
+            file.file.seek(position)
+            return file.file.read(size)
+
+        end = offset + length
+        while offset < end:
+            block = await asyncio.to_thread(read, offset, min(READ_BLOCK, end - offset))
+            if not block:
+                return
+            offset += len(block)
+            yield block
+
+    @staticmethod
+    async def _size(file: UploadFile) -> int:
+        if file.size is not None:
+            return file.size
+        return await asyncio.to_thread(file.file.seek, 0, os.SEEK_END)
+
+    @staticmethod
+    async def content_hash(file: UploadFile) -> str:
+        """SHA-256 of the spooled upload, hashed block by block in a worker thread"""
+        def digest() -> str:
+            sha256 = hashlib.sha256()
+            file.file.seek(0)
+            for block in iter(lambda: file.file.read(HASH_BLOCK), b""):
+                sha256.update(block)
+            return sha256.hexdigest()
+
+        return await asyncio.to_thread(digest)
+
+    async def upload(self, bucket: str, path: str, file: UploadFile, content_type: str,
+                     access_token: Optional[str] = None, upsert: bool = False) -> int:
+        """Upload `file` to `bucket/path` and return the number of bytes sent"""
+        size = await self._size(file)
+
+        if size <= self.chunk_size:
+            await self._upload_single(bucket, path, file, size, content_type, access_token, upsert)
+            return size
+        return await self._upload_resumable(bucket, path, file, size, content_type, access_token, upsert)
+
+    async def _upload_single(self, bucket: str, path: str, file: UploadFile, size: int, content_type: str,
+                             access_token: Optional[str], upsert: bool) -> None:
+        headers = self._headers(access_token)
+        headers.update({
+            "Content-Type": content_type,
+            "Content-Length": str(size),
+            "x-upsert": "true" if upsert else "false",
+        })
+        response = await self.http.post(
+            f"{self.url}/storage/v1/object/{bucket}/{quote(path)}",
+            content=self._body(file, 0, size),
+            headers=headers,
+        )
+        if response.status_code >= 400:
+            raise ValueError(f"Failed storage upload: {response.status_code} {response.text}")
+
+    async def _upload_resumable(self, bucket: str, path: str, file: UploadFile, size: int, content_type: str,
+                                access_token: Optional[str], upsert: bool) -> int:
+        headers = self._headers(access_token)
+        headers["Tus-Resumable"] = TUS_VERSION
+        create = await self.http.post(
+            f"{self.url}/storage/v1/upload/resumable",
+            headers={
+                **headers,
+                "Upload-Length": str(size),
+                "Upload-Metadata": _tus_metadata(
+                    bucketName=bucket, objectName=path, contentType=content_type, cacheControl="3600"),
+                "x-upsert": "true" if upsert else "false",
+            },
+        )
+        if create.status_code != 201:
+            raise ValueError(f"Failed to start resumable upload: {create.status_code} {create.text}")
+        session_url = httpx.URL(f"{self.url}/storage/v1/upload/resumable").join(create.headers["Location"])
+
+        offset = 0
+        retries = 0
+        while offset < size:
+            length = min(self.chunk_size, size - offset)
+            try:
+                response = await self.http.patch(
+                    session_url,
+                    content=self._body(file, offset, length),
+                    headers={
+                        **headers,
+                        "Upload-Offset": str(offset),
+                        "Content-Length": str(length),
+                        "Content-Type": "application/offset+octet-stream",
+                    },
+                )
+                if response.status_code != 204:
+                    raise ValueError(f"{response.status_code} {response.text}")
+                offset = int(response.headers["Upload-Offset"])
+                retries = 0
+            except (httpx.HTTPError, ValueError) as e:
+                retries += 1
+                if retries > MAX_RETRIES:
+                    raise ValueError(f"Failed resumable upload of {path} at offset {offset}: {str(e)}")
+                logger.warning(f"Chunk upload of {path} at offset {offset} failed, resuming: {str(e)}")
+                # Ask the server how much it actually stored and continue from there
+                head = await self.http.head(session_url, headers=headers)
+                offset = int(head.headers.get("Upload-Offset", offset))
+        return offset
+
+    async def close(self) -> None:
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+
+
+# Create a singleton instance
+storage_uploader = StorageUploader()
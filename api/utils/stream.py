@@ -0,0 +1,138 @@
+import asyncio
+import json
+import os
+import time
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Optional, Union
+
+COALESCE_WINDOW = float(os.getenv("STREAM_COALESCE_MS", "20")) / 1000
+COALESCE_MAX_CHARS = int(os.getenv("STREAM_COALESCE_CHARS", "1024"))
+
+
+@dataclass(slots=True)
+class TextDelta:
+    text: str
+
+
+@dataclass(slots=True)
+class ToolCall:
+    id: str
+    name: str
+    args: str  # Raw JSON arguments as streamed by the model
+
+
+@dataclass(slots=True)
+class ToolResult:
+    id: str
+    name: str
+    args: str
+    result: Any
+
+
+@dataclass(slots=True)
+class Finish:
+    reason: str
+    prompt_tokens: int
+    completion_tokens: int
+
+
+StreamEvent = Union[TextDelta, ToolCall, ToolResult, Finish]
+
+
+def encode_event(event: StreamEvent, protocol: str = 'data') -> Optional[str]:
+    """Encode a stream event as a Vercel AI SDK frame, or None if the protocol has no frame for it"""
+    if protocol == 'text':
+        return event.text if type(event) is TextDelta else None
+
+    if type(event) is TextDelta:
+        return '0:{text}\n'.format(text=json.dumps(event.text))
+
+    if type(event) is ToolCall:
+        return '9:{{"toolCallId":"{id}","toolName":"{name}","args":{args}}}\n'.format(
+            id=event.id,
+            name=event.name,
+            args=event.args)
+
+    if type(event) is ToolResult:
+        return 'a:{{"toolCallId":"{id}","toolName":"{name}","args":{args},"result":{result}}}\n'.format(
+            id=event.id,
+            name=event.name,
+            args=event.args,
+            result=json.dumps(event.result))
+
+    if type(event) is Finish:
+        return 'd:{{"finishReason":"{reason}","usage":{{"promptTokens":{prompt},"completionTokens":{completion}}}}}\n'.format(
+            reason=event.reason,
+            prompt=event.prompt_tokens,
+            completion=event.completion_tokens)
+
+    return None
+
+
+async def coalesce(events: AsyncIterator[StreamEvent], window: float = COALESCE_WINDOW,
+                   max_chars: int = COALESCE_MAX_CHARS) -> AsyncIterator[StreamEvent]:
+    """
+    Merge consecutive text deltas into fewer, larger ones.
+    Buffered text is flushed once it is `window` seconds old or `max_chars` long, and
+    immediately before any other event. The first delta is never delayed, so time to
+    first token is unaffected. A window of 0 disables coalescing.
+    """
+    if window <= 0:
+        async for event in events:
+            yield event
+        return
+
+    iterator = events.__aiter__()
+    buffer = []
+    size = 0
+    flush_at = None
+    first = True
+    pending = None
+
+    try:
+        while True:
+            if pending is None:
+                pending = asyncio.ensure_future(iterator.__anext__())
+            if buffer:
+                # Wait for the next event without cancelling it, so the upstream generator survives
+                done, _ = await asyncio.wait((pending,), timeout=max(flush_at - time.monotonic(), 0))
+                if not done:
+                    yield TextDelta("".join(buffer))
+                    buffer, size = [], 0
+                    continue
+
+            try:
+                event = await pending
+            except StopAsyncIteration:
+                break
+            finally:
+                pending = None
+
+            if type(event) is TextDelta:
+                if first:
+                    first = False
+                    yield event
+                    continue
+                if not buffer:
+                    flush_at = time.monotonic() + window
+                buffer.append(event.text)
+                size += len(event.text)
+                if size >= max_chars:
+                    yield TextDelta("".join(buffer))
+                    buffer, size = [], 0
+                continue
+
+            if buffer:
+                yield TextDelta("".join(buffer))
+                buffer, size = [], 0
+            yield event
+
+        if buffer:
+            yield TextDelta("".join(buffer))
+    finally:
+        if pending is not None:
+            pending.cancel()
+            await asyncio.wait((pending,))
+        aclose = getattr(iterator, "aclose", None)
+        if aclose:
+            await aclose()
@@ -0,0 +1,121 @@
+import asyncio
+import json
+import logging
+import os
+from typing import AsyncIterator, Optional, Set
+
+from utils.redis import redis_client, RedisClient
+
+logger = logging.getLogger(__name__)
+
+_END = object()
+
+
+class StreamBuffer:
+    """
+    Buffers data-stream frames of a chat turn in a Redis stream so a dropped client can resume.
+    Generation runs in a background task that keeps going when the client disconnects.
+    Frame n is stored under entry id `0-n`, so a client resumes with the number of frames
+    it already received. Buffers expire shortly after the turn completes.
+    """
+
+    def __init__(self, redis: RedisClient):
+        self.redis = redis
+        self.ttl = int(os.getenv("STREAM_BUFFER_TTL", "300"))
+        self.max_age = int(os.getenv("STREAM_BUFFER_MAX_AGE", "3600"))
+        self.block_ms = int(os.getenv("STREAM_BUFFER_BLOCK_MS", "5000"))
+        self._tasks: Set[asyncio.Task] = set()
+
+    @property
+    def enabled(self) -> bool:
+        return self.redis.async_client is not None
+
+    @staticmethod
+    def _key(chat_id: str, stream_id: str) -> str:
+        return f"stream:{chat_id}:{stream_id}"
+
+    async def _append(self, key: str, seq: int, fields: dict) -> None:
+        try:
+            await self.redis.async_client.xadd(key, fields, id=f"0-{seq}")
+            if seq == 1:
+                # Bound the lifetime even if this worker dies mid-generation
+                await self.redis.async_client.expire(key, self.max_age)
+        except Exception as e:
+            logger.error(f"Error buffering stream frame for {key}: {str(e)}")
+
+    def detach(self, chat_id: str, stream_id: str, frames: AsyncIterator[str]) -> AsyncIterator[str]:
+        """Run `frames` to completion in the background and return the live view of it"""
+        key = self._key(chat_id, stream_id)
+        live: asyncio.Queue = asyncio.Queue()
+        state = {"attached": True}
+
+        async def pump():
+            seq = 0
+            try:
+                async for frame in frames:
+                    seq += 1
+                    if state["attached"]:
+                        live.put_nowait(frame)
+                    await self._append(key, seq, {"f": frame})
+            except Exception as e:
+                logger.error(f"Chat stream {key} failed: {str(e)}")
+                seq += 1
+                error_frame = '3:{error}\n'.format(error=json.dumps(str(e)))
+                if state["attached"]:
+                    live.put_nowait(error_frame)
+                await self._append(key, seq, {"f": error_frame})
+            finally:
+                live.put_nowait(_END)
+                await self._append(key, seq + 1, {"end": "1"})
+                try:
+                    await self.redis.async_client.expire(key, self.ttl)
+                except Exception as e:
+                    logger.error(f"Error expiring stream buffer {key}: {str(e)}")
+
+        task = asyncio.create_task(pump())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+        async def relay():
+            try:
+                while True:
+                    frame = await live.get()
+                    if frame is _END:
+                        return
+                    yield frame
+            finally:
+                state["attached"] = False
+
+        return relay()
+
+    async def resume(self, chat_id: str, stream_id: str, offset: int = 0) -> Optional[AsyncIterator[str]]:
+        """Replay frames after `offset`, then tail live output; None if there is no such buffer"""
+        key = self._key(chat_id, stream_id)
+        if not self.enabled or not await self.redis.async_client.exists(key):
+            return None
+
+        async def frames():
+            last_id = f"0-{offset}"
+            while True:
+                entries = await self.redis.async_client.xread({key: last_id}, block=self.block_ms, count=100)
+                if not entries:
+                    if not await self.redis.async_client.exists(key):
+                        return
+                    continue
+                for _, items in entries:
+                    for entry_id, fields in items:
+                        last_id = entry_id
+                        if b"end" in fields:
+                            return
+                        yield fields[b"f"].decode()
+
+        return frames()
+
+    async def shutdown(self) -> None:
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+
+# Create a singleton instance
+stream_buffer = StreamBuffer(redis_client)
@@ -0,0 +1,118 @@
+import time
+from typing import Optional
+
+from opentelemetry import metrics, trace
+
+from utils.model_router import model_router
+
+tracer = trace.get_tracer(__name__)
+meter = metrics.get_meter(__name__)
+
+queue_wait_histogram = meter.create_histogram(
+    "chat.queue_wait", unit="s", description="Time spent waiting for a completion slot")
+connect_time_histogram = meter.create_histogram(
+    "chat.provider_connect_time", unit="s", description="Time until the provider opened the stream")
+ttft_histogram = meter.create_histogram(
+    "chat.time_to_first_token", unit="s", description="Time from request to the first streamed token")
+inter_token_histogram = meter.create_histogram(
+    "chat.inter_token_gap", unit="s", description="Gap between consecutive streamed tokens")
+tokens_per_second_histogram = meter.create_histogram(
+    "chat.tokens_per_second", unit="{token}/s", description="Completion tokens per second after the first token")
+prompt_tokens_histogram = meter.create_histogram(
+    "chat.prompt_tokens", unit="{token}", description="Prompt tokens reported in the usage frame")
+completion_tokens_histogram = meter.create_histogram(
+    "chat.completion_tokens", unit="{token}", description="Completion tokens reported in the usage frame")
+
+
+class StreamTelemetry:
+    """Latency and throughput of a single chat stream, tagged by modelId and protocol"""
+
+    def __init__(self, model_id: str, protocol: str):
+        self.attributes = {"modelId": model_id, "protocol": protocol}
+        self.started = time.perf_counter()
+        self.span = tracer.start_span("chat.stream", attributes=self.attributes)
+        self.queue_wait: Optional[float] = None
+        self.connect_time: Optional[float] = None
+        self.ttft: Optional[float] = None
+        self.first_token_at: Optional[float] = None
+        self.last_token_at: Optional[float] = None
+        self.deltas = 0
+        self.prompt_tokens: Optional[int] = None
+        self.completion_tokens: Optional[int] = None
+        self.served_by = model_id
+        self.from_cache = False
+        self._ended = False
+
+    def _elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def admitted(self) -> None:
+        self.queue_wait = self._elapsed()
+        queue_wait_histogram.record(self.queue_wait, self.attributes)
+        self.span.add_event("admitted", {"queue_wait": self.queue_wait})
+
+    def connected(self, model_id: str) -> None:
+        """The provider returned a stream; with hedging only the first connection counts"""
+        if self.connect_time is not None:
+            return
+        self.connect_time = self._elapsed()
+        connect_time_histogram.record(self.connect_time, self.attributes)
+        self.span.add_event("provider_connected", {"model": model_id, "elapsed": self.connect_time})
+
+    def served(self, model_id: str) -> None:
+        self.served_by = model_id
+        self.span.set_attribute("servedBy", model_id)
+
+    def cached(self) -> None:
+        """The answer is replayed from the response cache; its timings say nothing about the provider"""
+        self.from_cache = True
+        self.span.set_attribute("cached", True)
+
+    def token(self) -> None:
+        now = time.perf_counter()
+        if self.from_cache:
+            self.deltas += 1
+            return
+        if self.first_token_at is None:
+            self.first_token_at = now
+            self.ttft = now - self.started
+            ttft_histogram.record(self.ttft, self.attributes)
+            self.span.add_event("first_token", {"ttft": self.ttft})
+        else:
+            inter_token_histogram.record(now - self.last_token_at, self.attributes)
+        self.last_token_at = now
+        self.deltas += 1
+
+    def usage(self, prompt_tokens: int, completion_tokens: int) -> None:
+        self.prompt_tokens = prompt_tokens
+        self.completion_tokens = completion_tokens
+        prompt_tokens_histogram.record(prompt_tokens, self.attributes)
+        completion_tokens_histogram.record(completion_tokens, self.attributes)
+        self.span.add_event("usage", {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens})
+
+    @property
+    def tokens_per_second(self) -> Optional[float]:
+        if self.first_token_at is None or self.last_token_at == self.first_token_at:
+            return None
+        tokens = self.completion_tokens or self.deltas
+        return tokens / (self.last_token_at - self.first_token_at)
+
+    def end(self, error: Exception = None) -> None:
+        if self._ended:
+            return
+        self._ended = True
+
+        if self.tokens_per_second is not None:
+            tokens_per_second_histogram.record(self.tokens_per_second, self.attributes)
+            self.span.set_attribute("tokens_per_second", self.tokens_per_second)
+        if error is not None:
+            self.span.record_exception(error)
+            self.span.set_status(trace.Status(trace.StatusCode.ERROR, str(error)))
+        self.span.end()
+
+        # Feed the auto router; cache replays and streams rejected at admission or abandoned
+        # before output say nothing about the model
+        if self.from_cache:
+            return
+        if self.queue_wait is not None and (error is not None or self.ttft is not None):
+            model_router.observe(self.served_by, self.ttft, self.tokens_per_second, error is not None)
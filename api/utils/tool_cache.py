@@ -0,0 +1,87 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+from typing import Any, Callable, Optional, Tuple
+
+from utils.cache import LRUCache
+from utils.redis import redis_client, RedisClient
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TOOL_TTL = int(os.getenv("TOOL_CACHE_TTL", "60"))
+
+
+class ToolResultCache:
+    """Memoizes tool results in an in-process LRU, backed by Redis"""
+
+    def __init__(self, redis: RedisClient, max_entries: int = None):
+        self.redis = redis
+        self.local = LRUCache(max_entries or int(os.getenv("TOOL_CACHE_MAX_ENTRIES", "1024")))
+        self.local_hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(name: str, args: dict) -> str:
+        """Key on the tool name plus canonicalized JSON arguments"""
+        canonical = json.dumps(args, sort_keys=True, separators=(",", ":"), default=str)
+        digest = hashlib.sha256(canonical.encode()).hexdigest()
+        return f"tool:{name}:{digest}"
+
+    def _count(self, counter: str) -> None:
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def get(self, name: str, args: dict) -> Tuple[bool, Any]:
+        """Return (hit, result) for a tool call"""
+        key = self.make_key(name, args)
+
+        entry = self.local.get(key)
+        if entry is not None:
+            self._count("local_hits")
+            return True, entry["result"]
+
+        entry = self.redis.get(key)
+        if entry is not None:
+            self._count("redis_hits")
+            self.local.set(key, entry, ttl=entry.get("ttl"))
+            return True, entry["result"]
+
+        self._count("misses")
+        return False, None
+
+    def set(self, name: str, args: dict, result: Any, ttl: Optional[int] = None) -> None:
+        ttl = ttl or DEFAULT_TOOL_TTL
+        key = self.make_key(name, args)
+        entry = {"result": result, "ttl": ttl}
+        self.local.set(key, entry, ttl=ttl)
+        self.redis.set(key, entry, ttl=ttl)
+
+    def call(self, name: str, func: Callable, args: dict) -> Any:
+        """Run a synchronous tool through the cache"""
+        hit, result = self.get(name, args)
+        if hit:
+            return result
+
+        result = func(**args)
+        self.set(name, args, result, getattr(func, "ttl", None))
+        return result
+
+    def stats(self) -> dict:
+        hits = self.local_hits + self.redis_hits
+        lookups = hits + self.misses
+        return {
+            "local_hits": self.local_hits,
+            "redis_hits": self.redis_hits,
+            "misses": self.misses,
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "local_entries": len(self.local),
+            "local_evictions": self.local.evictions,
+        }
+
+
+# Create a singleton instance
+tool_cache = ToolResultCache(redis_client)
@@ -0,0 +1,82 @@
+import asyncio
+import functools
+import json
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable, Dict, List, Tuple
+
+from utils.tool_cache import tool_cache
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TOOL_TIMEOUT = float(os.getenv("TOOL_TIMEOUT", "10"))
+
+
+class ToolExecutor:
+    """Runs the tool calls of a model turn concurrently, off the event loop"""
+
+    def __init__(self, max_workers: int = None):
+        self.max_workers = max_workers or int(os.getenv("TOOL_WORKERS", "8"))
+        self.pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="tool")
+
+    async def _call(self, name: str, func: Callable, args: dict) -> Any:
+        loop = asyncio.get_running_loop()
+        cacheable = getattr(func, "cacheable", False)
+
+        if not asyncio.iscoroutinefunction(func):
+            if cacheable:
+                # Cache lookups may hit Redis, so they run on the pool together with the tool
+                return await loop.run_in_executor(self.pool, tool_cache.call, name, func, args)
+            return await loop.run_in_executor(self.pool, functools.partial(func, **args))
+
+        if not cacheable:
+            return await func(**args)
+
+        hit, result = await loop.run_in_executor(self.pool, tool_cache.get, name, args)
+        if hit:
+            return result
+        result = await func(**args)
+        await loop.run_in_executor(self.pool, tool_cache.set, name, args, result, getattr(func, "ttl", None))
+        return result
+
+    async def _run_one(self, tool_call: dict, available_tools: Dict[str, Callable]) -> Tuple[dict, Any]:
+        name = tool_call["name"]
+        func = available_tools.get(name)
+        if func is None:
+            return tool_call, {"error": f"Unknown tool: {name}"}
+
+        timeout = getattr(func, "timeout", DEFAULT_TOOL_TIMEOUT)
+        try:
+            spec = getattr(func, "tool_spec", None)
+            args = spec.parse_arguments(tool_call["arguments"]) if spec else json.loads(tool_call["arguments"] or "{}")
+            result = await asyncio.wait_for(self._call(name, func, args), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Tool {name} timed out after {timeout}s")
+            result = {"error": f"Tool {name} timed out after {timeout}s"}
+        except Exception as e:
+            logger.error(f"Tool {name} failed: {str(e)}")
+            result = {"error": f"Tool {name} failed: {str(e)}"}
+        return tool_call, result
+
+    async def run(self, tool_calls: List[dict], available_tools: Dict[str, Callable]) -> AsyncIterator[Tuple[dict, Any]]:
+        """Yield (tool_call, result) pairs in completion order.
+
+        Each call is bounded by its tool's `timeout`. Closing the iterator, e.g. when
+        the client disconnects, cancels calls that are still pending; a call already
+        running in a worker thread finishes but its result is discarded.
+        """
+        tasks = [asyncio.create_task(self._run_one(tool_call, available_tools)) for tool_call in tool_calls]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def shutdown(self) -> None:
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+
+# Create a singleton instance
+tool_executor = ToolExecutor()
@@ -0,0 +1,129 @@
+import hashlib
+import inspect
+import json
+import re
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, get_type_hints
+
+from pydantic import ConfigDict, create_model
+
+
+def _parse_docstring(doc: Optional[str]) -> Tuple[str, Dict[str, str]]:
+    """Split a Google-style docstring into its summary and per-argument descriptions"""
+    doc = inspect.cleandoc(doc or "")
+    summary = doc.split("\n\n", 1)[0].replace("\n", " ").strip()
+
+    params = {}
+    section = re.search(r"^Args:\s*\n(.*?)(?:^\S|\Z)", doc, re.MULTILINE | re.DOTALL)
+    if section:
+        for match in re.finditer(r"^\s+(\w+)(?:\s*\([^)]*\))?:\s*(.+)$", section.group(1), re.MULTILINE):
+            params[match.group(1)] = match.group(2).strip()
+    return summary, params
+
+
+def _strip_titles(schema: Any) -> Any:
+    """Drop pydantic's generated titles; providers bill for every schema token"""
+    if isinstance(schema, dict):
+        return {key: _strip_titles(value) for key, value in schema.items()
+                if not (key == "title" and isinstance(value, str))}
+    if isinstance(schema, list):
+        return [_strip_titles(value) for value in schema]
+    return schema
+
+
+@dataclass(frozen=True)
+class ToolSpec:
+    """A registered tool: its callable, argument validator and provider payload"""
+    name: str
+    func: Callable
+    validator: type
+    payload: dict
+
+    def parse_arguments(self, arguments: Optional[str]) -> dict:
+        """Validate the model's JSON arguments and return them as keyword arguments"""
+        return dict(self.validator.model_validate_json(arguments or "{}"))
+
+
+@dataclass(frozen=True)
+class ToolSet:
+    """A fixed selection of tools, ready to attach to a completion request"""
+    payloads: List[dict]
+    functions: Dict[str, Callable]
+    digest: str
+
+
+class ToolRegistry:
+    """
+    Introspects tool functions once, at registration.
+    Each tool's JSON schema and provider payload is generated from its signature and
+    docstring and cached together with a compiled pydantic validator for its arguments.
+    Tool sets are cached by their names, so requests attach tools without building schemas.
+    """
+
+    def __init__(self):
+        self.tools: Dict[str, ToolSpec] = {}
+        self._sets: Dict[Tuple[str, ...], ToolSet] = {}
+
+    def register(self, func: Callable = None, *, name: str = None, description: str = None):
+        """Register a tool; usable as `@tool_registry.register` or `@tool_registry.register(name=...)`"""
+        if func is None:
+            return lambda f: self.register(f, name=name, description=description)
+
+        target = func if inspect.isfunction(func) or inspect.ismethod(func) else func.__call__
+        name = name or func.__name__
+        summary, param_docs = _parse_docstring(inspect.getdoc(target))
+        hints = get_type_hints(target)
+
+        fields = {}
+        for param in inspect.signature(target).parameters.values():
+            if param.kind in (param.VAR_POSITIONAL, param.VAR_KEYWORD):
+                continue
+            annotation = hints.get(param.name, Any)
+            default = ... if param.default is param.empty else param.default
+            fields[param.name] = (annotation, default)
+
+        validator = create_model(f"{name}_arguments", __config__=ConfigDict(extra="ignore"), **fields)
+        parameters = _strip_titles(validator.model_json_schema())
+        for param_name, param_doc in param_docs.items():
+            if param_name in parameters.get("properties", {}):
+                parameters["properties"][param_name].setdefault("description", param_doc)
+
+        spec = ToolSpec(
+            name=name,
+            func=func,
+            validator=validator,
+            payload={
+                "type": "function",
+                "function": {
+                    "name": name,
+                    "description": description or summary,
+                    "parameters": parameters,
+                },
+            },
+        )
+        self.tools[name] = spec
+        self._sets.clear()
+        func.tool_spec = spec
+        return func
+
+    def get(self, name: str) -> Optional[ToolSpec]:
+        return self.tools.get(name)
+
+    def select(self, names: Iterable[str]) -> ToolSet:
+        """The payloads and callables for a set of registered tools, cached by name"""
+        key = tuple(sorted(set(names)))
+        tool_set = self._sets.get(key)
+        if tool_set is None:
+            specs = [self.tools[name] for name in key]
+            payloads = [spec.payload for spec in specs]
+            tool_set = ToolSet(
+                payloads=payloads,
+                functions={spec.name: spec.func for spec in specs},
+                digest=hashlib.sha256(json.dumps(payloads, sort_keys=True).encode()).hexdigest(),
+            )
+            self._sets[key] = tool_set
+        return tool_set
+
+
+# Create a singleton instance
+tool_registry = ToolRegistry()
@@ -1,6 +1,34 @@
 import random
+from typing import Literal
 
-def get_current_weather(location, unit="fahrenheit"):
+from utils.tool_registry import tool_registry
+
+
+def tool_options(timeout: float = None, cacheable: bool = False, ttl: int = None):
+    """
+    Declare per-tool execution options on a chat tool.
+    Cacheable tools have their results memoized by arguments for `ttl` seconds.
+    """
+    def decorator(func):
+        if timeout is not None:
+            func.timeout = timeout
+        func.cacheable = cacheable
+        if ttl is not None:
+            func.ttl = ttl
+        return func
+    return decorator
+
+
+@tool_registry.register
+@tool_options(timeout=5, cacheable=True, ttl=60)
+def get_current_weather(location: str, unit: Literal["celsius", "fahrenheit"] = "fahrenheit"):
+    """
+    Get the current weather in a given location
+
+    Args:
+        location: The city and state, e.g. San Francisco, CA
+        unit: The unit of temperature to use
+    """
     if unit == "celsius":
         temperature = random.randint(-34, 43)
     else:
@@ -10,4 +38,8 @@ def get_current_weather(location, unit="fahrenheit"):
         "temperature": temperature,
         "unit": unit,
         "location": location,
-    }
\ No newline at end of file
+    }
+
+
+# Tools offered to every chat completion
+CHAT_TOOLS = ["get_current_weather"]
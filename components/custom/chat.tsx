@@ -2,10 +2,11 @@
 
 import { Attachment, Message } from 'ai';
 import { useChat } from '@ai-sdk/react';
-import { useState } from 'react';
+import { useEffect, useState } from 'react';
 import useSWR, { useSWRConfig } from 'swr';
 import { toast } from 'sonner';
 import { ChatHeader } from '@/components/custom/chat-header';
+import { createClient } from '@/lib/supabase/client';
 import { Database } from '@/lib/supabase/types';
 import { fetcher } from '@/lib/utils';
 import { MultimodalInput } from './multimodal-input';
@@ -23,6 +24,23 @@ export function Chat({
   selectedModelId: string;
 }) {
   const [attachments, setAttachments] = useState<Array<Attachment>>([]);
+  const [accessToken, setAccessToken] = useState<string | undefined>();
+
+  useEffect(() => {
+    // The chat API authenticates every turn with the user's access token
+    const supabase = createClient();
+    supabase.auth.getSession().then(({ data: { session } }) => {
+      setAccessToken(session?.access_token);
+    });
+
+    const { data: { subscription } } = supabase.auth.onAuthStateChange((_event, session) => {
+      setAccessToken(session?.access_token);
+    });
+
+    return () => {
+      subscription.unsubscribe();
+    };
+  }, []);
 
   const {
     messages,
@@ -40,6 +58,7 @@ export function Chat({
       modelId: selectedModelId,
       messages: initialMessages,
     },
+    headers: accessToken ? { Authorization: `Bearer ${accessToken}` } : undefined,
     maxSteps: 5,
     api: '/api/chat',
     initialMessages,
@@ -0,0 +1,5 @@
+-- SHA-256 of the uploaded bytes, used to skip storage writes for content a user already uploaded
+ALTER TABLE file_uploads ADD COLUMN IF NOT EXISTS content_hash text;
+
+CREATE INDEX IF NOT EXISTS file_uploads_user_id_content_hash_idx
+    ON file_uploads (user_id, content_hash);
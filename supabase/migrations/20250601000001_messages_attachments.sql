@@ -0,0 +1,3 @@
+-- Attachments and tool invocations of a message, so the API can rebuild full history for delta requests
+ALTER TABLE public.messages ADD COLUMN IF NOT EXISTS experimental_attachments jsonb;
+ALTER TABLE public.messages ADD COLUMN IF NOT EXISTS tool_invocations jsonb;